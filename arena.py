@@ -0,0 +1,213 @@
+from array import array
+from nodes import Operator, Program, StmtSeq, If, Repeat, Assign, Read, Write, BinOp, Const, Id
+from parser import parse_program_iterative
+
+# Kind codes are indices into NODE_CLASSES.
+NODE_CLASSES = (Program, StmtSeq, If, Repeat, Assign, Read, Write, BinOp, Const, Id)
+KIND_CODES = {cls: code for code, cls in enumerate(NODE_CLASSES)}
+PROGRAM, STMT_SEQ, IF, REPEAT, ASSIGN, READ, WRITE, BINOP, CONST, ID = range(len(NODE_CLASSES))
+
+OPERATORS = tuple(Operator)
+OPERATOR_CODES = {op: code for code, op in enumerate(OPERATORS)}
+
+NONE = -1
+
+class AstArena:
+    """A whole syntax tree held in parallel arrays instead of node objects.
+
+    Node i has kind kinds[i], its first child at first_child[i], its next
+    sibling at next_sibling[i] (NONE when absent) and a payload[i] that
+    indexes names (assign/read/id), constants (const) or OPERATORS (OP).
+    The four node arrays are not tracked by the garbage collector; names
+    and constants are plain lists, but hold one entry per distinct value
+    rather than one per node.
+    """
+
+    def __init__(self):
+        self.kinds = array('B')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.payload = array('i')
+        self.names = []
+        self.constants = []
+        self.root = NONE
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def children(self, index):
+        child = self.first_child[index]
+        next_sibling = self.next_sibling
+        while child != NONE:
+            yield child
+            child = next_sibling[child]
+
+    def walk(self, index=None):
+        """Yield the indices of a subtree in pre-order, without recursion."""
+        if index is None:
+            index = self.root
+        first_child, next_sibling = self.first_child, self.next_sibling
+        yield index
+        stack = []
+        if first_child[index] != NONE:
+            stack.append(first_child[index])
+        while stack:
+            current = stack.pop()
+            yield current
+            if next_sibling[current] != NONE:
+                stack.append(next_sibling[current])
+            if first_child[current] != NONE:
+                stack.append(first_child[current])
+
+    def value(self, index):
+        """Return the name, int constant or Operator of a node, or None."""
+        kind = self.kinds[index]
+        if kind in (ASSIGN, READ, ID):
+            return self.names[self.payload[index]]
+        if kind == CONST:
+            return self.constants[self.payload[index]]
+        if kind == BINOP:
+            return OPERATORS[self.payload[index]]
+        return None
+
+    def label(self, index):
+        kind_name = NODE_CLASSES[self.kinds[index]].kind
+        value = self.value(index)
+        if value is None:
+            return kind_name
+        if isinstance(value, Operator):
+            value = value.value
+        return f"{kind_name} ({value})"
+
+    def to_tree(self, index=None):
+        """Rebuild the typed node tree rooted at index."""
+        if index is None:
+            index = self.root
+        order = list(self.walk(index))
+        built = {}
+        for current in reversed(order):
+            children = [built.pop(child) for child in self.children(current)]
+            kind = self.kinds[current]
+            if kind == STMT_SEQ:
+                node = StmtSeq(children)
+            elif kind in (ASSIGN, BINOP):
+                node = NODE_CLASSES[kind](self.value(current), *children)
+            elif kind in (READ, CONST, ID):
+                node = NODE_CLASSES[kind](self.value(current))
+            else:
+                node = NODE_CLASSES[kind](*children)
+            built[current] = node
+        return built[index]
+
+    @classmethod
+    def from_tree(cls, root):
+        """Copy a typed node tree into a new arena.
+
+        Raises TypeError for nodes the arena has no kind for: generic
+        SyntaxTreeNodes and the Error nodes of a recovered parse.
+        """
+        build = ArenaBuilder()
+        stack = [(root, NONE)]
+        while stack:
+            node, parent = stack.pop()
+            kind = KIND_CODES.get(type(node))
+            if kind is None:
+                raise TypeError(f"AstArena cannot hold {type(node).__name__} nodes")
+            index = build.node(kind, build.payload_of(node))
+            if parent == NONE:
+                build.arena.root = index
+            else:
+                build.append(parent, index)
+            stack.extend((child, index) for child in reversed(node.children))
+        return build.arena
+
+class ArenaBuilder:
+    """parse_program_iterative builder that writes nodes into an AstArena."""
+
+    def __init__(self, arena=None):
+        self.arena = arena if arena is not None else AstArena()
+        # Only needed while children are still being appended.
+        self.last_child = array('i')
+        self.name_codes = {}
+        self.constant_codes = {}
+
+    def node(self, kind, payload=NONE, children=()):
+        arena = self.arena
+        index = len(arena.kinds)
+        arena.kinds.append(kind)
+        arena.payload.append(payload)
+        arena.first_child.append(children[0] if children else NONE)
+        arena.next_sibling.append(NONE)
+        for left, right in zip(children, children[1:]):
+            arena.next_sibling[left] = right
+        self.last_child.append(children[-1] if children else NONE)
+        return index
+
+    def append(self, parent, child):
+        last = self.last_child[parent]
+        if last == NONE:
+            self.arena.first_child[parent] = child
+        else:
+            self.arena.next_sibling[last] = child
+        self.last_child[parent] = child
+
+    def name(self, name):
+        code = self.name_codes.get(name)
+        if code is None:
+            code = self.name_codes[name] = len(self.arena.names)
+            self.arena.names.append(name)
+        return code
+
+    def constant(self, value):
+        code = self.constant_codes.get(value)
+        if code is None:
+            code = self.constant_codes[value] = len(self.arena.constants)
+            self.arena.constants.append(value)
+        return code
+
+    def payload_of(self, node):
+        if isinstance(node, (Assign, Read, Id)):
+            return self.name(node.name)
+        if isinstance(node, Const):
+            return self.constant(node.value)
+        if isinstance(node, BinOp):
+            return OPERATOR_CODES[node.op]
+        return NONE
+
+    def program(self, body):
+        return self.node(PROGRAM, NONE, (body,))
+
+    def stmt_seq(self):
+        return self.node(STMT_SEQ)
+
+    def if_stmt(self, cond, then_branch, else_branch=None):
+        if else_branch is None:
+            return self.node(IF, NONE, (cond, then_branch))
+        return self.node(IF, NONE, (cond, then_branch, else_branch))
+
+    def repeat(self, body, cond):
+        return self.node(REPEAT, NONE, (body, cond))
+
+    def assign(self, name, expr):
+        return self.node(ASSIGN, self.name(name), (expr,))
+
+    def read(self, name):
+        return self.node(READ, self.name(name))
+
+    def write(self, expr):
+        return self.node(WRITE, NONE, (expr,))
+
+    def binop(self, op, left, right):
+        return self.node(BINOP, OPERATOR_CODES[op], (left, right))
+
+    def const(self, value):
+        return self.node(CONST, self.constant(value))
+
+    def id(self, name):
+        return self.node(ID, self.name(name))
+
+def parse_program_arena(ts):
+    """Parse a TokenStream straight into an AstArena, making no node objects."""
+    build = ArenaBuilder()
+    build.arena.root = parse_program_iterative(ts, build)
+    return build.arena
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+import importlib.util
+import subprocess
+import platform
+import tracemalloc
+from scanner import tokenize
+from parser import TokenStream, parse_program
+import instrument
+
+# Benchmarks for the scanner, parser and visualizer over synthetic programs.
+#
+#   python bench.py --sizes 1000 100000 --save-baseline bench_baseline.json
+#   python bench.py --baseline bench_baseline.json   # exits 1 on a regression
+#   python bench.py --startup                          # exits 1 over the import budget
+#   python bench.py --max-size 10000000                # the full sweep, up to 10M tokens
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+# The 10M step takes minutes and several GB (about 10x the 1M step), so the
+# default sweep stops below it; --max-size opts in.
+DEFAULT_MAX_SIZE = 1_000_000
+GRAPHVIZ_LIMIT = 100_000  # dot is far slower than the rest; larger sizes skip it
+DEFAULT_TOLERANCE = 0.25
+NOISE_SECONDS = 0.002  # slowdowns smaller than this are timer noise, not regressions
+DEFAULT_BASELINE = "bench_baseline.json"
+
+# Cumulative import time allowed for each module, in seconds (measured with
+# python -X importtime, best of STARTUP_RUNS), and the modules it must not
+# pull in: the core scanner/parser path is GUI- and dependency-free, and the
+# editor loads docx, Graphviz and PIL only when they are first used.
+STARTUP_BUDGETS = {"scanner": 0.05, "parser": 0.05, "main": 0.3}
+STARTUP_FORBIDDEN = {
+    "scanner": ("tkinter", "PIL", "graphviz", "docx"),
+    "parser": ("tkinter", "PIL", "graphviz", "docx"),
+    "main": ("PIL", "graphviz", "docx", "multiprocessing"),
+}
+STARTUP_RUNS = 3
+
+OPERATORS = ("+", "-", "*", "/")
+COMPARISONS = ("<", "=")
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+class ProgramGenerator:
+    """Seeded generator of valid TINY programs.
+
+    max_depth bounds the nesting of if/repeat statements and of brackets in
+    expressions, expression_width is the most operands an expression has,
+    identifiers is the number of distinct variable names, and nesting is
+    the chance that a statement is an if or repeat. The same arguments
+    always produce the same program.
+    """
+
+    def __init__(self, seed=0, max_depth=3, expression_width=3, identifiers=26, nesting=0.15):
+        self.random = random.Random(seed)
+        self.max_depth = max_depth
+        self.expression_width = expression_width
+        self.nesting = nesting
+        # a..z, then a1..z1 and so on; none of them is a keyword.
+        self.names = [LETTERS[i % 26] + (str(i // 26) if i >= 26 else "") for i in range(identifiers)]
+
+    def program(self, tokens):
+        """Return a program of about tokens tokens (it stops after the statement that reaches the count)."""
+        out = []
+        while len(out) < tokens:
+            if out:
+                out.append(";\n")
+            self._statement(out, 0)
+        return " ".join(out).replace(" ;\n ", ";\n")
+
+    def _statements(self, out, depth):
+        for index in range(self.random.randint(1, 4)):
+            if index:
+                out.append(";\n")
+            self._statement(out, depth)
+
+    def _statement(self, out, depth):
+        r = self.random
+        if depth < self.max_depth and r.random() < self.nesting:
+            if r.random() < 0.5:
+                out.append("if")
+                self._condition(out, depth)
+                out.append("then")
+                self._statements(out, depth + 1)
+                if r.random() < 0.5:
+                    out.append("else")
+                    self._statements(out, depth + 1)
+                out.append("end")
+            else:
+                out.append("repeat")
+                self._statements(out, depth + 1)
+                out.append("until")
+                self._condition(out, depth)
+            return
+        kind = r.random()
+        if kind < 0.6:
+            out.append(r.choice(self.names))
+            out.append(":=")
+            self._expression(out, depth)
+        elif kind < 0.8:
+            out.append("read")
+            out.append(r.choice(self.names))
+        else:
+            out.append("write")
+            self._expression(out, depth)
+
+    def _condition(self, out, depth):
+        self._expression(out, depth)
+        out.append(self.random.choice(COMPARISONS))
+        self._expression(out, depth)
+
+    def _expression(self, out, depth):
+        r = self.random
+        for index in range(r.randint(1, self.expression_width)):
+            if index:
+                out.append(r.choice(OPERATORS))
+            choice = r.random()
+            if choice < 0.1 and depth < self.max_depth:
+                out.append("(")
+                self._expression(out, depth + 1)
+                out.append(")")
+            elif choice < 0.55:
+                out.append(r.choice(self.names))
+            else:
+                out.append(str(r.randrange(1000)))
+
+def generate_program(tokens, seed=0, max_depth=3, expression_width=3, identifiers=26):
+    return ProgramGenerator(seed, max_depth, expression_width, identifiers).program(tokens)
+
+def _measure(function, repeat, memory, name="measure"):
+    """Run function repeat times; return (best seconds, peak traced bytes or None, last result).
+
+    Peak memory comes from one extra run under tracemalloc, which slows
+    code down, so the timed runs are untraced. Each timed run is an
+    instrument phase called name.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with instrument.phase(name):
+            result = function()
+        best = min(best, time.perf_counter() - started)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak, result
+
+def sweep(max_size=DEFAULT_MAX_SIZE):
+    """The DEFAULT_SIZES up to max_size (all of them if max_size is 0 or None)."""
+    return [size for size in DEFAULT_SIZES if not max_size or size <= max_size]
+
+def run_benchmarks(sizes=None, seed=0, max_depth=3, expression_width=3, identifiers=26,
+                   repeat=1, memory=True, graphviz_limit=GRAPHVIZ_LIMIT, report=None):
+    """Time every stage at every size; returns a list of result dicts.
+
+    Each stage works on the previous stage's output: tokenize the source,
+    parse the tokens, build the DOT with TreeVisualizer.render_tree, and
+    rasterise it with Graphviz (only up to graphviz_limit tokens). Stages
+    whose libraries are not installed are skipped. report, if given, is
+    called with each result as it is measured. sizes defaults to sweep().
+    """
+    from visualizer import TreeVisualizer, render_png
+    # visualizer imports graphviz only when it draws, so importing it proves nothing.
+    has_graphviz = importlib.util.find_spec("graphviz") is not None
+    results = []
+    for size in sizes or sweep():
+        source = generate_program(size, seed, max_depth, expression_width, identifiers)
+        tokens = None
+        stages = [
+            ("tokenize", lambda: tokenize(source)),
+            ("parse", lambda: parse_program(TokenStream(tokens))),
+        ]
+        if has_graphviz:
+            stages.append(("render_tree", lambda: TreeVisualizer().render_tree(root)))
+            if size <= graphviz_limit:
+                stages.append(("graphviz", lambda: render_png(dot.source)))
+        for stage, function in stages:
+            seconds, peak, output = _measure(function, repeat, memory, stage)
+            if stage == "tokenize":
+                tokens = output
+                count = len(tokens)
+            elif stage == "parse":
+                root = output
+            elif stage == "render_tree":
+                dot = output
+                if dot is None:
+                    break  # no tree to time, and nothing for Graphviz to rasterise
+            result = {"stage": stage, "tokens": count, "size": size, "seconds": seconds,
+                      "tokens_per_second": count / seconds if seconds else None, "peak_bytes": peak}
+            results.append(result)
+            if report:
+                report(result)
+    return results
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return the results that are slower, or use more memory, than baseline by more than tolerance.
+
+    Each entry is (result, baseline result, what) where what is "time" or
+    "memory". Results with no matching stage and size in the baseline are
+    ignored.
+    """
+    previous = {(result["stage"], result["size"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["stage"], result["size"]))
+        if before is None:
+            continue
+        if result["seconds"] > before["seconds"] * (1 + tolerance) + NOISE_SECONDS:
+            regressions.append((result, before, "time"))
+        if result["peak_bytes"] and before.get("peak_bytes") and result["peak_bytes"] > before["peak_bytes"] * (1 + tolerance):
+            regressions.append((result, before, "memory"))
+    return regressions
+
+def measure_import(module):
+    """Import module in a fresh interpreter; return (cumulative seconds, names of the modules it loaded)."""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode:
+        raise ImportError(completed.stderr.strip().splitlines()[-1])
+    seconds, loaded = None, set()
+    # Lines look like "import time:   self [us] | cumulative | name", nested names indented.
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        loaded.add(name.split(".")[0])
+        if name == module:
+            seconds = int(cumulative) / 1e6
+    return seconds, loaded
+
+def check_startup(budgets=STARTUP_BUDGETS, forbidden=STARTUP_FORBIDDEN, runs=STARTUP_RUNS):
+    """Return a list of problems (strings) with the import time or imports of each module in budgets."""
+    problems = []
+    for module, budget in budgets.items():
+        measurements = [measure_import(module) for _ in range(runs)]
+        seconds = min(seconds for seconds, _ in measurements)
+        print(f"{module:<12}{seconds * 1000:>10.1f} ms  (budget {budget * 1000:.0f} ms)")
+        if seconds > budget:
+            problems.append(f"importing {module} took {seconds * 1000:.1f} ms, over its {budget * 1000:.0f} ms budget")
+        loaded = measurements[0][1]
+        for name in forbidden.get(module, ()):
+            if name in loaded:
+                problems.append(f"importing {module} loads {name}")
+    return problems
+
+def format_result(result):
+    peak = f"{result['peak_bytes'] / 1e6:>10.1f}" if result["peak_bytes"] is not None else f"{'-':>10}"
+    rate = f"{result['tokens_per_second']:>14,.0f}" if result["tokens_per_second"] else f"{'-':>14}"
+    return f"{result['stage']:<12}{result['tokens']:>11,}{result['seconds'] * 1000:>12.2f}{rate}{peak}"
+
+HEADER = f"{'stage':<12}{'tokens':>11}{'time (ms)':>12}{'tokens/s':>14}{'peak (MB)':>10}"
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the TINY scanner, parser and visualizer.")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", help="program sizes, in tokens (default: the sweep up to --max-size)")
+    arg_parser.add_argument("--max-size", type=int, default=DEFAULT_MAX_SIZE,
+                            help=f"largest size of the default sweep, 0 for all of {DEFAULT_SIZES[0]:,}-{DEFAULT_SIZES[-1]:,} "
+                                 f"(default: {DEFAULT_MAX_SIZE:,})")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--depth", type=int, default=3, help="maximum nesting depth")
+    arg_parser.add_argument("--width", type=int, default=3, help="maximum operands per expression")
+    arg_parser.add_argument("--identifiers", type=int, default=26, help="number of distinct variable names")
+    arg_parser.add_argument("--repeat", type=int, default=1, help="timed runs per stage; the best is kept")
+    arg_parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    arg_parser.add_argument("--graphviz-limit", type=int, default=GRAPHVIZ_LIMIT, help="largest size to rasterise")
+    arg_parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against, if it exists")
+    arg_parser.add_argument("--save-baseline", metavar="PATH", help="write these results as the new baseline")
+    arg_parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown, as a fraction")
+    arg_parser.add_argument("--startup", action="store_true", help="check import times and imports instead")
+    arg_parser.add_argument("--profile", action="store_true", help="print the total time of each stage at the end")
+    options = arg_parser.parse_args(argv)
+
+    if options.startup:
+        problems = check_startup()
+        for problem in problems:
+            print(f"STARTUP {problem}")
+        return 1 if problems else 0
+
+    sizes = options.sizes or sweep(options.max_size)
+    print(HEADER)
+    with instrument.Recorder() if options.profile else contextlib.nullcontext() as recorder:
+        results = run_benchmarks(sizes, options.seed, options.depth, options.width, options.identifiers,
+                                 options.repeat, not options.no_memory, options.graphviz_limit,
+                                 report=lambda result: print(format_result(result), flush=True))
+    if recorder:
+        print(instrument.format_totals(recorder.totals()))
+
+    if options.save_baseline:
+        with open(options.save_baseline, "w") as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results},
+                      file, indent=2)
+        print(f"Baseline written to {options.save_baseline}.")
+        return 0
+    if not os.path.exists(options.baseline):
+        return 0
+    with open(options.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline, options.tolerance)
+    for result, before, what in regressions:
+        if what == "time":
+            change = f"{before['seconds'] * 1000:.2f} -> {result['seconds'] * 1000:.2f} ms"
+        else:
+            change = f"{before['peak_bytes'] / 1e6:.1f} -> {result['peak_bytes'] / 1e6:.1f} MB"
+        print(f"REGRESSION {result['stage']} at {result['size']} tokens ({what}): {change}")
+    print(f"{len(regressions)} regressions against {options.baseline}.")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
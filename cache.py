@@ -0,0 +1,170 @@
+import os
+import hashlib
+import marshal
+import scanner
+import parser
+import nodes
+import arena
+from scanner import TokenBuffer, scan
+from parser import TokenStream, parse_program
+from arena import AstArena
+
+# Bump when the entry layout below changes.
+FORMAT_VERSION = 1
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "tiny")
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 << 20
+
+def _code_version():
+    """Digest of the modules that decide what tokens and trees look like.
+
+    Editing the scanner or parser changes the digest, so stale entries are
+    never served. Where the sources are not readable (a frozen executable)
+    only FORMAT_VERSION is used.
+    """
+    digest = hashlib.sha256(str(FORMAT_VERSION).encode())
+    for module in (scanner, parser, nodes, arena):
+        try:
+            with open(module.__file__, "rb") as file:
+                digest.update(file.read())
+        except (OSError, TypeError):
+            pass
+    return digest.hexdigest()[:16]
+
+def _encode(tokens, tree):
+    return marshal.dumps((
+        FORMAT_VERSION,
+        tokens.kinds.tobytes(), tokens.starts.tobytes(), tokens.ends.tobytes(), tokens.lines.tobytes(),
+        tree.kinds.tobytes(), tree.first_child.tobytes(), tree.next_sibling.tobytes(), tree.payload.tobytes(),
+        tree.names, tree.constants, tree.root,
+    ))
+
+def _decode(data, source):
+    (version, kinds, starts, ends, lines,
+     node_kinds, first_child, next_sibling, payload, names, constants, root) = marshal.loads(data)
+    if version != FORMAT_VERSION:
+        raise ValueError("cache entry format mismatch")
+    tokens = TokenBuffer(source)
+    tokens.kinds.frombytes(kinds)
+    tokens.starts.frombytes(starts)
+    tokens.ends.frombytes(ends)
+    tokens.lines.frombytes(lines)
+    tree = AstArena()
+    tree.kinds.frombytes(node_kinds)
+    tree.first_child.frombytes(first_child)
+    tree.next_sibling.frombytes(next_sibling)
+    tree.payload.frombytes(payload)
+    tree.names, tree.constants, tree.root = list(names), list(constants), root
+    return tokens, tree
+
+class ParseCache:
+    """On-disk cache of scan + parse results, keyed by a hash of the source.
+
+    Each entry holds the token arrays of a TokenBuffer and the arrays of an
+    AstArena, so a hit rebuilds both without running the scanner or parser.
+    Entries are files in directory; the least recently used ones are
+    evicted once there are more than max_entries or they exceed max_bytes.
+    Any I/O problem degrades to a miss: the cache never makes parsing fail.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = _code_version()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source):
+        return hashlib.sha256(f"{self.version}\0{source}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".bin")
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+    def get(self, source):
+        """Return (TokenBuffer, syntax tree root) for source, or None on a miss."""
+        path = self._path(self.key(source))
+        try:
+            with open(path, "rb") as file:
+                tokens, tree = _decode(file.read(), source)
+            os.utime(path)  # mtime doubles as the LRU timestamp
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, EOFError, TypeError):
+            self.misses += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        self.hits += 1
+        return tokens, tree.to_tree()
+
+    def put(self, source, tokens, root):
+        """Store the tokens (a TokenBuffer) and tree for source.
+
+        Trees the arena cannot hold, such as a recovered parse with Error
+        nodes, are not stored.
+        """
+        try:
+            tree = AstArena.from_tree(root)
+        except TypeError:
+            return
+        if not isinstance(tokens, TokenBuffer):
+            tokens = scan(source)
+        path = self._path(self.key(source))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as file:
+                file.write(_encode(tokens, tree))
+            os.replace(temporary, path)
+            self.evict()
+        except OSError:
+            pass
+
+    def parse(self, source):
+        """Scan and parse source, going through the cache. Returns (tokens, root)."""
+        cached = self.get(source)
+        if cached is not None:
+            return cached
+        tokens = scan(source)
+        root = parse_program(TokenStream(tokens))
+        self.put(source, tokens, root)
+        return tokens, root
+
+    def evict(self):
+        """Delete least recently used entries until the size limits hold."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bin"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        entries.sort()
+        count, total = len(entries), sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            count -= 1
+            total -= size
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bin"):
+                os.remove(entry.path)
@@ -0,0 +1,71 @@
+from collections import deque
+from nodes import Node
+
+# Trees larger than this are drawn with subtrees collapsed into summary nodes.
+NODE_BUDGET = 500
+
+class ViewNode(Node):
+    """A shown node: the original node's kind and label, with only the children chosen for display."""
+    __slots__ = ('node', 'kind', 'label', 'children')
+
+    def __init__(self, node):
+        self.node = node
+        self.kind = node.kind
+        self.label = node.label
+        self.children = []
+
+class SummaryNode(Node):
+    """Stands in for the children of node after the first shown ones."""
+    __slots__ = ('node', 'shown', 'hidden', 'index')
+    kind = 'summary'
+
+    def __init__(self, node, shown, hidden, index):
+        self.node = node
+        self.shown = shown
+        self.hidden = hidden
+        self.index = index  # position in collapse_tree's summaries list
+
+    @property
+    def label(self):
+        return f"+{self.hidden} hidden"
+
+def expand(expanded, summary, max_nodes=NODE_BUDGET):
+    """Record in expanded (a dict) that summary was clicked: show up to max_nodes more of its children."""
+    expanded[summary.node] = summary.shown + summary.hidden if max_nodes is None else summary.shown + max_nodes
+
+def collapse_tree(root, max_nodes=NODE_BUDGET, max_depth=None, expanded=None):
+    """Choose which part of a tree to draw; returns (view root, summaries).
+
+    Nodes are taken breadth first until max_nodes are shown or max_depth is
+    reached; the children that do not fit are replaced by one SummaryNode
+    per parent. expanded maps a node to how many of its children to show
+    regardless of the budget (see expand()). Only the shown nodes are
+    visited, so the cost depends on the budget and the expansions, not on
+    the size of the tree. max_nodes=None means no budget.
+    """
+    expanded = expanded or {}
+    view_root = ViewNode(root)
+    summaries = []
+    shown = 1
+    queue = deque([(root, view_root, 0)])
+    while queue:
+        node, view, depth = queue.popleft()
+        children = node.children
+        if node in expanded:
+            count = min(len(children), expanded[node])
+        elif max_depth is not None and depth >= max_depth:
+            count = 0
+        elif max_nodes is None:
+            count = len(children)
+        else:
+            count = max(0, min(len(children), max_nodes - shown))
+        for child in children[:count]:
+            child_view = ViewNode(child)
+            view.children.append(child_view)
+            queue.append((child, child_view, depth + 1))
+        shown += count
+        if count < len(children):
+            summary = SummaryNode(node, count, len(children) - count, len(summaries))
+            summaries.append(summary)
+            view.children.append(summary)
+    return view_root, summaries
@@ -0,0 +1,106 @@
+from scanner import scan, KEYWORDS, TOKEN_TYPES
+import instrument
+
+HIGHLIGHT_DELAY_MS = 30
+
+# Text tag for each scanner token kind; identifiers are left in the editor's colour.
+TOKEN_TAGS = [None if token_type == "IDENTIFIER" else "number" if token_type == "NUMBER"
+              else "keyword" if token_type in KEYWORDS.values() else "operator"
+              for token_type in TOKEN_TYPES]
+
+THEMES = {
+    "light": {"keyword": "#0000cc", "number": "#098658", "operator": "#a31515"},
+    "dark": {"keyword": "#569cd6", "number": "#b5cea8", "operator": "#d7ba7d"},
+}
+
+def _runs(lines):
+    """Group sorted line numbers into (first, last) runs of consecutive lines."""
+    runs = []
+    for line in lines:
+        if runs and line == runs[-1][1] + 1:
+            runs[-1][1] = line
+        else:
+            runs.append([line, line])
+    return runs
+
+class SyntaxHighlighter:
+    """Colours TINY tokens in a Text widget, re-tagging only the lines on screen.
+
+    Call schedule(line) after an edit; HIGHLIGHT_DELAY_MS after the last
+    call, the visible lines and the edited ones are scanned and re-tagged.
+    Scrolling schedules a refresh too, so lines are coloured as they come
+    into view. A refresh costs time in proportion to the window's height,
+    not to the length of the file. TINY tokens never span lines, so any
+    run of lines can be scanned on its own.
+    """
+
+    def __init__(self, text, scrollbar=None):
+        self.text = text
+        self.scrollbar = scrollbar
+        self.pending = None
+        self.edited = set()  # lines edited since the last refresh
+        if scrollbar is not None:
+            text.config(yscrollcommand=self._on_scroll)
+
+    def configure(self, theme):
+        for tag, color in THEMES[theme].items():
+            self.text.tag_configure(tag, foreground=color)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.schedule()
+
+    def schedule(self, line=None):
+        """Refresh once typing or scrolling pauses; line, if given, was edited."""
+        if line is not None:
+            self.edited.add(line)
+        if self.pending is not None:
+            self.text.after_cancel(self.pending)
+        self.pending = self.text.after(HIGHLIGHT_DELAY_MS, self.refresh)
+
+    def refresh(self):
+        self.pending = None
+        text = self.text
+        first = int(text.index("@0,0").split(".")[0])
+        last = int(text.index(f"@0,{text.winfo_height()}").split(".")[0])
+        end = int(text.index("end-1c").split(".")[0])
+        lines = set(range(first, last + 1))
+        lines.update(line for line in self.edited if line <= end)
+        self.edited = set()
+        with instrument.phase("highlight") as record:
+            for run_first, run_last in _runs(sorted(lines)):
+                self.highlight(run_first, run_last)
+            record.count(lines=len(lines))
+
+    def highlight(self, first, last):
+        """Re-tag lines first to last (1-based, inclusive)."""
+        text = self.text
+        start, stop = f"{first}.0", f"{last}.end"
+        for tag in THEMES["light"]:
+            text.tag_remove(tag, start, stop)
+        source = text.get(start, stop)
+        try:
+            buffers = [(first, scan(source))]
+        except RuntimeError:
+            # A character TINY does not allow: scan line by line and leave that line plain.
+            buffers = []
+            for line, line_text in enumerate(source.split("\n"), first):
+                try:
+                    buffers.append((line, scan(line_text)))
+                except RuntimeError:
+                    pass
+        ranges = {tag: [] for tag in THEMES["light"]}
+        for buffer_line, buffer in buffers:
+            source, kinds, starts, ends, lines = buffer.source, buffer.kinds, buffer.starts, buffer.ends, buffer.lines
+            for index in range(len(buffer)):
+                tag = TOKEN_TAGS[kinds[index]]
+                if tag is None:
+                    continue
+                token_start = starts[index]
+                column = token_start - source.rfind("\n", 0, token_start) - 1
+                line = buffer_line + lines[index] - 1
+                ranges[tag] += (f"{line}.{column}", f"{line}.{column + ends[index] - token_start}")
+        # One tag_add per tag with every range, instead of one Tcl call per token.
+        for tag, indices in ranges.items():
+            if indices:
+                text.tag_add(tag, *indices)
@@ -0,0 +1,224 @@
+import bisect
+from itertools import accumulate
+from scanner import scan, line_column
+from parser import TokenStream, parse_statement, parse_stmt_sequence, STATEMENT_START
+from nodes import Program, StmtSeq
+
+# The program text is kept as a list of segments, one per top-level
+# statement: each runs from just after the previous top-level ';' up to and
+# including its own ';' (the last segment runs to the end of the text and may
+# be empty). An edit re-scans and re-parses only the segments it touches;
+# every other segment keeps its tokens and subtree.
+
+OPENERS = {"IF", "REPEAT"}
+CLOSERS = {"END", "UNTIL"}
+
+# Segment.status values, mirroring what parse_stmt_sequence would do there.
+CONTINUES = "continues"          # statement parsed; the sequence goes on
+ENDS = "ends"                    # statement parsed, but tokens follow it, so the program stops here
+NOT_STATEMENT = "not_statement"  # no statement starts here, so the program stops before it
+ERROR = "error"                  # parse_statement raised
+LEX_ERROR = "lex_error"          # the scanner rejected the text
+
+class Segment:
+    __slots__ = ('text', 'tokens', 'node', 'status')
+
+    def __init__(self, text, tokens):
+        self.text = text
+        self.tokens = tokens
+        self.node = None
+        if not tokens or tokens[0][1] not in STATEMENT_START:
+            self.status = NOT_STATEMENT
+            return
+        ts = TokenStream(tokens)
+        try:
+            self.node = parse_statement(ts)
+        except SyntaxError:
+            self.status = ERROR
+            return
+        rest = tokens[ts.position:]
+        self.status = CONTINUES if not rest or rest == [(";", "SEMICOLON")] else ENDS
+
+class _SegmentTokens:
+    """One segment's tokens, seen at their whole-file indices.
+
+    Re-parsing a segment through this view makes TokenStream report the
+    same token number and line:column as a parse of the whole file would.
+    """
+
+    def __init__(self, buffer, base, offset, source):
+        self.buffer = buffer
+        self.base = base
+        self.offset = offset
+        self.source = source
+
+    def __len__(self):
+        return self.base + len(self.buffer)
+
+    def __getitem__(self, index):
+        return self.buffer[index - self.base]
+
+    def position(self, index):
+        return line_column(self.source, self.offset + self.buffer.starts[index - self.base])
+
+def _split(text):
+    """Cut text at top-level semicolons; return (segments, remaining text)."""
+    buffer = scan(text)
+    segments = []
+    first = cut = depth = 0
+    for index in range(len(buffer)):
+        kind = buffer.type(index)
+        if kind in OPENERS:
+            depth += 1
+        elif kind in CLOSERS:
+            depth = max(depth - 1, 0)
+        elif kind == "SEMICOLON" and depth == 0:
+            end = buffer.ends[index]
+            segments.append(Segment(text[cut:end], buffer[first:index + 1]))
+            first, cut = index + 1, end
+    return segments, text[cut:], buffer[first:]
+
+class IncrementalParser:
+    """Keeps tokens and a parse tree up to date as the source is edited.
+
+    edit(offset, removed, inserted) costs time proportional to the text of
+    the statements the edit touches, plus a cheap pass over the list of
+    segment lengths; tree() and tokens() give the same results (and raise
+    the same errors) as scan + parse_program over the whole text.
+    """
+
+    def __init__(self, source=""):
+        # lengths, statuses and nodes parallel segments so that locating an
+        # edit and assembling the tree are list operations done in C.
+        self.segments = []
+        self.lengths = []
+        self.statuses = []
+        self.nodes = []
+        self._replace(0, 0, source, at_end=True)
+
+    @property
+    def source(self):
+        return "".join(segment.text for segment in self.segments)
+
+    def _replace(self, first, last, text, at_end):
+        """Rebuild segments[first:last], whose new text is text."""
+        while True:
+            try:
+                segments, tail, tail_tokens = _split(text)
+            except RuntimeError:
+                segment = Segment(text, [])
+                segment.status = LEX_ERROR
+                segments, tail, at_end = [segment], "", False
+            if at_end:
+                segments.append(Segment(tail, tail_tokens))
+                break
+            if not tail:
+                break
+            # The edit changed how the following text groups into statements
+            # (e.g. a ';' or 'end' was deleted): take in more segments, doubling
+            # the amount each time so a long cascade stays linear.
+            grow = min(len(self.segments), last + max(1, last - first))
+            text += "".join(segment.text for segment in self.segments[last:grow])
+            last = grow
+            at_end = last == len(self.segments)
+        self.segments[first:last] = segments
+        self.lengths[first:last] = [len(segment.text) for segment in segments]
+        self.statuses[first:last] = [segment.status for segment in segments]
+        self.nodes[first:last] = [segment.node for segment in segments]
+        return first, first + len(segments)
+
+    def edit(self, offset, removed, inserted):
+        """Apply an edit: replace removed characters at offset with inserted.
+
+        Returns the (start, stop) range of segment indices that were rebuilt.
+        """
+        starts = [0, *accumulate(self.lengths)]
+        end = offset + removed
+        if not 0 <= offset <= end <= starts[-1]:
+            raise ValueError(f"Edit {offset}+{removed} is outside the source")
+        count = len(self.segments)
+        first = bisect.bisect_right(starts, offset, 0, count) - 1
+        last = bisect.bisect_right(starts, end, 0, count)
+        region = "".join(segment.text for segment in self.segments[first:last])
+        local_offset = offset - starts[first]
+        text = region[:local_offset] + inserted + region[local_offset + removed:]
+        return self._replace(first, last, text, at_end=last == count)
+
+    def update(self, source):
+        """Bring the parser up to date with source by diffing it against the current text."""
+        old = self.source
+        limit = min(len(old), len(source))
+        low, high = 0, limit
+        while low < high:
+            middle = (low + high + 1) // 2
+            if old[:middle] == source[:middle]:
+                low = middle
+            else:
+                high = middle - 1
+        prefix = low
+        low, high = 0, limit - prefix
+        while low < high:
+            middle = (low + high + 1) // 2
+            if old[len(old) - middle:] == source[len(source) - middle:]:
+                low = middle
+            else:
+                high = middle - 1
+        suffix = low
+        return self.edit(prefix, len(old) - prefix - suffix, source[prefix:len(source) - suffix])
+
+    def _check_lexing(self):
+        if LEX_ERROR in self.statuses:
+            scan(self.source)  # raises the scanner's error, positioned in the whole text
+
+    def tokens(self):
+        self._check_lexing()
+        return [token for segment in self.segments for token in segment.tokens]
+
+    def tree(self):
+        """Return the Program for the current text, like parse_program would."""
+        self._check_lexing()
+        statuses = self.statuses
+        stop = len(statuses)
+        for status in (ENDS, NOT_STATEMENT, ERROR):
+            try:
+                stop = statuses.index(status, 0, stop)
+            except ValueError:
+                pass
+        status = statuses[stop] if stop < len(statuses) else CONTINUES
+        if status == ERROR or (status == NOT_STATEMENT and stop == 0):
+            self._raise_error(stop)
+        return Program(StmtSeq(self.nodes[:stop + 1] if status == ENDS else self.nodes[:stop]))
+
+    def errors(self):
+        """Return every syntax error in the text, as ParseErrors in order.
+
+        Each top-level statement that fails to parse is parsed again with
+        error recovery at its whole-file position, so the cost depends on
+        the failing statements, not on the size of the text. Unlike tree(),
+        this also checks statements after the point where the program stops.
+        Raises the scanner's error if the text does not scan.
+        """
+        self._check_lexing()
+        statuses = self.statuses
+        failing = [index for index, status in enumerate(statuses) if status == ERROR] if ERROR in statuses else []
+        if statuses[0] == NOT_STATEMENT:
+            failing.insert(0, 0)  # tree() raises here too: the program has no first statement
+        if not failing:
+            return []
+        bases = [0, *accumulate(len(segment.tokens) for segment in self.segments)]
+        offsets = [0, *accumulate(self.lengths)]
+        source = self.source
+        errors = []
+        for index in failing:
+            ts = TokenStream(_SegmentTokens(scan(self.segments[index].text), bases[index], offsets[index], source), errors)
+            ts.position = bases[index]
+            parse_stmt_sequence(ts)
+        return errors
+
+    def _raise_error(self, index):
+        segment = self.segments[index]
+        base = sum(len(before.tokens) for before in self.segments[:index])
+        offset = sum(self.lengths[:index])
+        ts = TokenStream(_SegmentTokens(scan(segment.text), base, offset, self.source))
+        ts.position = base
+        parse_statement(ts)
@@ -0,0 +1,142 @@
+import time
+import threading
+import tracemalloc
+from collections import namedtuple
+
+# Per-phase timing for the compile pipeline. Code wraps each phase in
+#
+#     with instrument.phase("parse") as record:
+#         root = parse_program(ts)
+#         record.count(nodes=...)
+#
+# and every listener registered with add_listener receives a PhaseEvent when
+# the phase ends. With no listeners, phase() hands back a shared do-nothing
+# record, so instrumented code costs one function call per phase.
+
+PhaseEvent = namedtuple("PhaseEvent", "name seconds counts allocated peak thread")
+PhaseEvent.__doc__ = """A finished phase: wall time, counts such as tokens or nodes, and,
+when allocation tracking is on, the bytes it left allocated and its peak
+traced memory above the starting point (otherwise None)."""
+
+_listeners = []
+_local = threading.local()
+
+class _Record:
+    __slots__ = ('name', 'counts', 'started', 'memory', 'peak')
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = {}
+
+    def count(self, **counts):
+        self.counts.update(counts)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.memory = self.peak = None
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # reset_peak() below starts this phase's measurement; keep the peak
+            # the enclosing phase had reached so far, or it would be lost.
+            if stack and stack[-1].peak is not None:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.memory = self.peak = current
+        stack.append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        stack = _local.stack
+        stack.pop()
+        allocated = peak = None
+        if self.memory is not None and tracemalloc.is_tracing():
+            current, traced_peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, traced_peak)
+            allocated = current - self.memory
+            peak = self.peak - self.memory
+            if stack and stack[-1].peak is not None:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+        event = PhaseEvent(self.name, seconds, self.counts, allocated, peak, threading.current_thread().name)
+        for listener in list(_listeners):
+            listener(event)
+        return False
+
+class _NullRecord:
+    __slots__ = ()
+
+    def count(self, **counts):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_RECORD = _NullRecord()
+
+def phase(name):
+    """Context manager timing one phase; a no-op unless a listener is registered."""
+    if not _listeners:
+        return _NULL_RECORD
+    return _Record(name)
+
+def add_listener(listener):
+    """Call listener(event) with a PhaseEvent at the end of every phase, on the thread that ran it."""
+    _listeners.append(listener)
+
+def remove_listener(listener):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+def track_allocations(enabled=True):
+    """Start (or stop) tracemalloc so phases also report allocations. It slows everything down."""
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+class Recorder:
+    """A listener that keeps every event; use as `with Recorder() as recorder: ...`."""
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+    def __enter__(self):
+        add_listener(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        remove_listener(self)
+        return False
+
+    def totals(self):
+        """Return {phase name: total seconds}, in order of first appearance."""
+        totals = {}
+        for event in self.events:
+            totals[event.name] = totals.get(event.name, 0.0) + event.seconds
+        return totals
+
+def format_event(event):
+    counts = ", ".join(f"{key}={value}" for key, value in event.counts.items())
+    allocated = f"{event.allocated / 1024:>12.1f}" if event.allocated is not None else f"{'-':>12}"
+    return f"{event.name:<16}{event.seconds * 1000:>11.3f}{allocated}  {counts}"
+
+def format_totals(totals):
+    """Format {phase name: seconds} (e.g. Recorder.totals()) as a table with each phase's share."""
+    total = sum(totals.values()) or 1.0
+    lines = [f"{'phase':<16}{'time (s)':>10}{'share':>8}"]
+    lines.extend(f"{name:<16}{seconds:>10.3f}{seconds / total:>8.1%}" for name, seconds in totals.items())
+    return "\n".join(lines)
+
+def format_report(events):
+    lines = [f"{'phase':<16}{'time (ms)':>11}{'alloc (KB)':>12}  counts"]
+    lines.extend(format_event(event) for event in events)
+    return "\n".join(lines)
@@ -0,0 +1,243 @@
+from nodes import Operator, Program, StmtSeq, If, Repeat, Assign, Read, Write, Const, Id
+from vm import divide, read_value
+
+# Three-address code. Operands are ints (constants) or variable names. User
+# variables keep their TINY names; temporaries are "%1", "%2", ... which no
+# TINY identifier can spell. An instruction's op is 'copy', 'read', 'write'
+# or, for binary operations, an Operator.
+
+COMMUTATIVE = {Operator.PLUS, Operator.MULT, Operator.EQUAL}
+
+def evaluate_binop(op, left, right):
+    if op is Operator.PLUS:
+        return left + right
+    if op is Operator.MINUS:
+        return left - right
+    if op is Operator.MULT:
+        return left * right
+    if op is Operator.DIV:
+        return divide(left, right)
+    if op is Operator.LESSTHAN:
+        return 1 if left < right else 0
+    return 1 if left == right else 0
+
+class Instr:
+    __slots__ = ('op', 'dest', 'args')
+
+    def __init__(self, op, dest=None, args=()):
+        self.op = op
+        self.dest = dest
+        self.args = args
+
+    def uses(self):
+        return [arg for arg in self.args if isinstance(arg, str)]
+
+    def can_raise(self):
+        """True if executing the instruction may fail (division by a non-constant or zero)."""
+        return self.op is Operator.DIV and not (isinstance(self.args[1], int) and self.args[1] != 0)
+
+    def __repr__(self):
+        args = ", ".join(str(arg) for arg in self.args)
+        if isinstance(self.op, Operator):
+            return f"{self.dest} = {self.args[0]} {self.op.value} {self.args[1]}"
+        if self.op == 'copy':
+            return f"{self.dest} = {args}"
+        if self.op == 'read':
+            return f"{self.dest} = read"
+        return f"{self.op} {args}"
+
+class BasicBlock:
+    """Straight-line instructions ending in a terminator.
+
+    terminator is 'jump' (targets holds one label), 'branch' (cond is
+    tested: non-zero goes to targets[0], zero to targets[1]) or 'halt'.
+    """
+    __slots__ = ('label', 'instrs', 'terminator', 'cond', 'targets')
+
+    def __init__(self, label):
+        self.label = label
+        self.instrs = []
+        self.terminator = 'halt'
+        self.cond = None
+        self.targets = ()
+
+    def jump(self, target):
+        self.terminator, self.cond, self.targets = 'jump', None, (target,)
+
+    def branch(self, cond, if_true, if_false):
+        self.terminator, self.cond, self.targets = 'branch', cond, (if_true, if_false)
+
+    def uses(self):
+        uses = []
+        for instr in self.instrs:
+            uses.extend(instr.uses())
+        if isinstance(self.cond, str):
+            uses.append(self.cond)
+        return uses
+
+class Loop:
+    """A repeat loop: preheader jumps to header, latch branches back to header."""
+    __slots__ = ('preheader', 'header', 'latch', 'blocks')
+
+    def __init__(self, preheader, header, latch, blocks):
+        self.preheader = preheader
+        self.header = header
+        self.latch = latch
+        self.blocks = blocks
+
+class IRFunction:
+    def __init__(self):
+        self.blocks = {}
+        self.block_counter = 0
+        self.entry = self.new_block().label
+        self.loops = []
+        self.variables = []
+        self.temp_counter = 0
+
+    def new_block(self):
+        block = BasicBlock(self.block_counter)
+        self.block_counter += 1
+        self.blocks[block.label] = block
+        return block
+
+    def new_temp(self):
+        self.temp_counter += 1
+        return f"%{self.temp_counter}"
+
+    def predecessors(self):
+        preds = {label: [] for label in self.blocks}
+        for block in self.blocks.values():
+            for target in block.targets:
+                preds[target].append(block.label)
+        return preds
+
+    def instruction_count(self):
+        return sum(len(block.instrs) + (block.terminator != 'halt') for block in self.blocks.values())
+
+    def format(self):
+        lines = []
+        for block in self.blocks.values():
+            lines.append(f"B{block.label}:")
+            lines.extend(f"    {instr!r}" for instr in block.instrs)
+            if block.terminator == 'jump':
+                lines.append(f"    jump B{block.targets[0]}")
+            elif block.terminator == 'branch':
+                lines.append(f"    branch {block.cond} ? B{block.targets[0]} : B{block.targets[1]}")
+            else:
+                lines.append("    halt")
+        return "\n".join(lines)
+
+class _Lowering:
+    def __init__(self):
+        self.function = IRFunction()
+        self.block = self.function.blocks[self.function.entry]
+        self.variable_set = set()
+
+    def variable(self, name):
+        if name not in self.variable_set:
+            self.variable_set.add(name)
+            self.function.variables.append(name)
+        return name
+
+    def emit(self, op, dest=None, args=()):
+        self.block.instrs.append(Instr(op, dest, args))
+
+    def expression(self, node):
+        if isinstance(node, Const):
+            return node.value
+        if isinstance(node, Id):
+            return self.variable(node.name)
+        left = self.expression(node.left)
+        right = self.expression(node.right)
+        dest = self.function.new_temp()
+        self.emit(node.op, dest, (left, right))
+        return dest
+
+    def statement(self, node):
+        function = self.function
+        if isinstance(node, Program):
+            self.statement(node.body)
+        elif isinstance(node, StmtSeq):
+            for statement in node.statements:
+                self.statement(statement)
+        elif isinstance(node, Assign):
+            value = self.expression(node.expr)
+            self.emit('copy', self.variable(node.name), (value,))
+        elif isinstance(node, Read):
+            self.emit('read', self.variable(node.name))
+        elif isinstance(node, Write):
+            self.emit('write', None, (self.expression(node.expr),))
+        elif isinstance(node, If):
+            cond = self.expression(node.cond)
+            branch_block = self.block
+            then_block = function.new_block()
+            self.block = then_block
+            self.statement(node.then_branch)
+            then_end = self.block
+            if node.else_branch is not None:
+                else_block = function.new_block()
+                self.block = else_block
+                self.statement(node.else_branch)
+                else_end = self.block
+                join = function.new_block()
+                branch_block.branch(cond, then_block.label, else_block.label)
+                else_end.jump(join.label)
+            else:
+                join = function.new_block()
+                branch_block.branch(cond, then_block.label, join.label)
+            then_end.jump(join.label)
+            self.block = join
+        elif isinstance(node, Repeat):
+            preheader = function.new_block()
+            self.block.jump(preheader.label)
+            header = function.new_block()
+            preheader.jump(header.label)
+            self.block = header
+            self.statement(node.body)
+            cond = self.expression(node.cond)
+            latch = self.block
+            exit_block = function.new_block()
+            latch.branch(cond, exit_block.label, header.label)
+            # Labels grow monotonically, so the loop is exactly the blocks
+            # created between its header and its exit.
+            blocks = set(range(header.label, exit_block.label))
+            function.loops.append(Loop(preheader.label, header.label, latch.label, blocks))
+            self.block = exit_block
+        else:
+            raise TypeError(f"Cannot lower node {node!r}")
+
+def lower_program(root):
+    """Lower a parse_program tree to an IRFunction (basic blocks forming a CFG)."""
+    lowering = _Lowering()
+    lowering.statement(root)
+    return lowering.function
+
+def execute_ir(function, inputs=(), output=print):
+    """Run an IRFunction with the same semantics and interface as vm.execute."""
+    env = dict.fromkeys(function.variables, 0)
+    inputs = iter(inputs)
+    blocks = function.blocks
+    block = blocks[function.entry]
+    while True:
+        for instr in block.instrs:
+            op = instr.op
+            if op == 'copy':
+                value = instr.args[0]
+                env[instr.dest] = value if type(value) is int else env[value]
+            elif op == 'write':
+                value = instr.args[0]
+                output(value if type(value) is int else env[value])
+            elif op == 'read':
+                env[instr.dest] = read_value(inputs)
+            else:
+                left, right = instr.args
+                env[instr.dest] = evaluate_binop(
+                    op, left if type(left) is int else env[left], right if type(right) is int else env[right])
+        if block.terminator == 'jump':
+            block = blocks[block.targets[0]]
+        elif block.terminator == 'branch':
+            cond = block.cond if type(block.cond) is int else env[block.cond]
+            block = blocks[block.targets[0] if cond else block.targets[1]]
+        else:
+            break
+    return {name: env[name] for name in function.variables}
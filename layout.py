@@ -0,0 +1,272 @@
+import io
+from xml.sax.saxutils import escape
+
+# A linear-time tidy tree layout (Walker's algorithm with Buchheim, Jünger and
+# Leipert's improvements) plus renderers for it. Everything runs in-process:
+# no Graphviz and no subprocess.
+
+CHAR_WIDTH = 7
+NODE_HEIGHT = 28
+PADDING = 16
+SIBLING_GAP = 10
+LEVEL_GAP = 40
+MARGIN = 20
+FONT_SIZE = 12
+
+# X11 colour names used by NODE_STYLES that PIL and SVG do not know.
+COLORS = {"plum1": "#ffbbff", "skyblue": "#87ceeb", "lightgoldenrod1": "#ffec8b", "palegreen": "#98fb98"}
+
+class TreeLayout:
+    """Positions for a tidy drawing of a tree.
+
+    Nodes are numbered in pre-order; node i (the tree node nodes[i]) has
+    centre (x[i], y[i]), size width[i] x height[i] and parent parent[i] (-1
+    for the root). pipe() and render() mirror graphviz.Source, so a
+    TreeLayout can be used wherever the editor uses Graphviz output.
+    """
+
+    def __init__(self, labels, styles, parent, x, y, width, height, horizontal=True, nodes=None):
+        self.nodes = nodes
+        self.labels = labels
+        self.styles = styles
+        self.parent = parent
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.horizontal = horizontal
+        self.size = (max(xi + wi / 2 for xi, wi in zip(x, width)) + MARGIN,
+                     max(yi + hi / 2 for yi, hi in zip(y, height)) + MARGIN)
+
+    def node_at(self, x, y):
+        """Return the index of the node whose box contains x, y, or -1."""
+        for index, (cx, cy, w, h) in enumerate(zip(self.x, self.y, self.width, self.height)):
+            if abs(x - cx) <= w / 2 and abs(y - cy) <= h / 2:
+                return index
+        return -1
+
+    def _edges(self):
+        """Yield (x1, y1, x2, y2) from each parent's border to its child's border."""
+        x, y, width, height = self.x, self.y, self.width, self.height
+        horizontal = self.horizontal
+        for child, parent in enumerate(self.parent):
+            if parent < 0:
+                continue
+            if horizontal:
+                yield x[parent] + width[parent] / 2, y[parent], x[child] - width[child] / 2, y[child]
+            else:
+                yield x[parent], y[parent] + height[parent] / 2, x[child], y[child] - height[child] / 2
+
+    def to_svg(self):
+        width, height = self.size
+        parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+                 f'font-family="monospace" font-size="{FONT_SIZE}" text-anchor="middle">\n',
+                 '<g stroke="black" fill="none">\n']
+        parts.extend(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}"/>\n'
+                     for x1, y1, x2, y2 in self._edges())
+        parts.append('</g>\n<g stroke="black">\n')
+        for label, (shape, color), x, y, w, h in zip(self.labels, self.styles, self.x, self.y, self.width, self.height):
+            fill = COLORS.get(color, color)
+            if shape == "ellipse":
+                parts.append(f'<ellipse cx="{x:.1f}" cy="{y:.1f}" rx="{w / 2:.1f}" ry="{h / 2:.1f}" fill="{fill}"/>')
+            else:
+                parts.append(f'<rect x="{x - w / 2:.1f}" y="{y - h / 2:.1f}" width="{w:.1f}" height="{h:.1f}" fill="{fill}"/>')
+            parts.append(f'<text x="{x:.1f}" y="{y + FONT_SIZE / 3:.1f}" stroke="none" fill="black">{escape(label)}</text>\n')
+        parts.append('</g>\n</svg>\n')
+        return "".join(parts)
+
+    def to_image(self, scale=1.0):
+        """Draw the tree on a PIL image (PIL is only needed for raster output)."""
+        from PIL import Image, ImageDraw, ImageFont
+        width, height = self.size
+        image = Image.new("RGB", (max(1, int(width * scale)), max(1, int(height * scale))), "white")
+        draw = ImageDraw.Draw(image)
+        font = ImageFont.load_default()
+        for x1, y1, x2, y2 in self._edges():
+            draw.line((x1 * scale, y1 * scale, x2 * scale, y2 * scale), fill="black")
+        for label, (shape, color), x, y, w, h in zip(self.labels, self.styles, self.x, self.y, self.width, self.height):
+            box = ((x - w / 2) * scale, (y - h / 2) * scale, (x + w / 2) * scale, (y + h / 2) * scale)
+            fill = COLORS.get(color, color)
+            if shape == "ellipse":
+                draw.ellipse(box, fill=fill, outline="black")
+            else:
+                draw.rectangle(box, fill=fill, outline="black")
+            left, top, right, bottom = draw.textbbox((0, 0), label, font=font)
+            draw.text((x * scale - (right - left) / 2, y * scale - (bottom - top) / 2), label, fill="black", font=font)
+        return image
+
+    def draw(self, canvas, scale=1.0):
+        """Draw the tree directly on a Tk canvas."""
+        for x1, y1, x2, y2 in self._edges():
+            canvas.create_line(x1 * scale, y1 * scale, x2 * scale, y2 * scale)
+        for label, (shape, color), x, y, w, h in zip(self.labels, self.styles, self.x, self.y, self.width, self.height):
+            box = ((x - w / 2) * scale, (y - h / 2) * scale, (x + w / 2) * scale, (y + h / 2) * scale)
+            fill = COLORS.get(color, color)
+            if shape == "ellipse":
+                canvas.create_oval(*box, fill=fill)
+            else:
+                canvas.create_rectangle(*box, fill=fill)
+            canvas.create_text(x * scale, y * scale, text=label)
+        canvas.config(scrollregion=(0, 0, self.size[0] * scale, self.size[1] * scale))
+
+    def pipe(self, format="png"):
+        """Return the drawing as bytes: 'svg', or 'png'/'pdf' (these need PIL)."""
+        if format == "svg":
+            return self.to_svg().encode("utf-8")
+        buffer = io.BytesIO()
+        self.to_image().save(buffer, format=format.upper())
+        return buffer.getvalue()
+
+    def render(self, filename, format="png", cleanup=False):
+        """Write filename.format, like graphviz.Source.render, and return its path."""
+        path = f"{filename}.{format}"
+        with open(path, "wb") as file:
+            file.write(self.pipe(format))
+        return path
+
+def layout_tree(root, style_of, rankdir="LR"):
+    """Lay out a syntax tree in linear time; style_of(node) gives a node's (shape, color).
+
+    rankdir is "LR" (root on the left, as the Graphviz backend draws it) or
+    "TB" (root on top).
+    """
+    # Flatten in pre-order, so every parent is numbered before its children.
+    nodes, labels, styles, parent, children = [], [], [], [], []
+    stack = [(root, -1)]
+    while stack:
+        node, parent_index = stack.pop()
+        index = len(labels)
+        nodes.append(node)
+        labels.append(str(node.label))
+        styles.append(style_of(node))
+        parent.append(parent_index)
+        children.append([])
+        if parent_index >= 0:
+            children[parent_index].append(index)
+        stack.extend((child, index) for child in reversed(node.children))
+    count = len(labels)
+
+    horizontal = rankdir == "LR"
+    width = [len(label) * CHAR_WIDTH + PADDING for label in labels]
+    height = [NODE_HEIGHT] * count
+    breadth = height if horizontal else width  # size along the sibling axis
+
+    number = [0] * count  # position among siblings
+    for kids in children:
+        for position, kid in enumerate(kids):
+            number[kid] = position
+
+    prelim = [0.0] * count
+    mod = [0.0] * count
+    shift = [0.0] * count
+    change = [0.0] * count
+    thread = [-1] * count
+    ancestor = list(range(count))
+    default_ancestor = [kids[0] if kids else -1 for kids in children]
+
+    def next_left(v):
+        kids = children[v]
+        return kids[0] if kids else thread[v]
+
+    def next_right(v):
+        kids = children[v]
+        return kids[-1] if kids else thread[v]
+
+    def apportion(v, default):
+        p = parent[v]
+        if number[v] == 0:
+            return default
+        siblings = children[p]
+        vip = vop = v
+        vim = siblings[number[v] - 1]
+        vom = siblings[0]
+        sip, sop, sim, som = mod[vip], mod[vop], mod[vim], mod[vom]
+        while True:
+            right, left = next_right(vim), next_left(vip)
+            if right < 0 or left < 0:
+                break
+            vim, vip = right, left
+            vom, vop = next_left(vom), next_right(vop)
+            ancestor[vop] = v
+            gap = (prelim[vim] + sim) - (prelim[vip] + sip) + (breadth[vim] + breadth[vip]) / 2 + SIBLING_GAP
+            if gap > 0:
+                wm = ancestor[vim] if parent[ancestor[vim]] == p else default
+                subtrees = number[v] - number[wm]
+                change[v] -= gap / subtrees
+                shift[v] += gap
+                change[wm] += gap / subtrees
+                prelim[v] += gap
+                mod[v] += gap
+                sip += gap
+                sop += gap
+            sim += mod[vim]
+            sip += mod[vip]
+            som += mod[vom]
+            sop += mod[vop]
+        if next_right(vim) >= 0 and next_right(vop) < 0:
+            thread[vop] = next_right(vim)
+            mod[vop] += sim - sop
+        if next_left(vip) >= 0 and next_left(vom) < 0:
+            thread[vom] = next_left(vip)
+            mod[vom] += sip - som
+            default = v
+        return default
+
+    # First walk, in left-to-right post-order: the reverse of a pre-order
+    # that visits children right to left.
+    order = []
+    stack = [0]
+    while stack:
+        v = stack.pop()
+        order.append(v)
+        stack.extend(children[v])
+    order.reverse()
+    for v in order:
+        kids = children[v]
+        p = parent[v]
+        left = children[p][number[v] - 1] if p >= 0 and number[v] > 0 else -1
+        if kids:
+            total_shift = total_change = 0.0
+            for kid in reversed(kids):
+                prelim[kid] += total_shift
+                mod[kid] += total_shift
+                total_change += change[kid]
+                total_shift += shift[kid] + total_change
+            midpoint = (prelim[kids[0]] + prelim[kids[-1]]) / 2
+            if left >= 0:
+                prelim[v] = prelim[left] + (breadth[left] + breadth[v]) / 2 + SIBLING_GAP
+                mod[v] = prelim[v] - midpoint
+            else:
+                prelim[v] = midpoint
+        elif left >= 0:
+            prelim[v] = prelim[left] + (breadth[left] + breadth[v]) / 2 + SIBLING_GAP
+        if p >= 0:
+            default_ancestor[p] = apportion(v, default_ancestor[p])
+
+    # Second walk, in pre-order (index order): add up the modifiers.
+    along = [0.0] * count
+    depth = [0] * count
+    accumulated = [0.0] * count
+    for v in range(count):
+        p = parent[v]
+        if p >= 0:
+            accumulated[v] = accumulated[p] + mod[p]
+            depth[v] = depth[p] + 1
+        along[v] = prelim[v] + accumulated[v]
+    offset = MARGIN - min(a - b / 2 for a, b in zip(along, breadth))
+    along = [a + offset for a in along]
+
+    # Each level is as deep as its deepest node.
+    extent = width if horizontal else height
+    level_size = [0] * (max(depth) + 1)
+    for d, e in zip(depth, extent):
+        if e > level_size[d]:
+            level_size[d] = e
+    level_centre, position = [], MARGIN
+    for size in level_size:
+        level_centre.append(position + size / 2)
+        position += size + LEVEL_GAP
+    across = [level_centre[d] for d in depth]
+
+    return TreeLayout(labels, styles, parent, across if horizontal else along,
+                      along if horizontal else across, width, height, horizontal, nodes)
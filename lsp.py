@@ -0,0 +1,380 @@
+import re
+import sys
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from scanner import scan, KEYWORDS, TOKEN_TYPES
+from incremental import IncrementalParser, LEX_ERROR
+import instrument
+
+# A Language Server Protocol server for TINY, speaking JSON-RPC over stdin and
+# stdout:
+#
+#     python lsp.py
+#
+# The reader thread only records each document's text. Analysis runs on one
+# worker thread, DEBOUNCE_SECONDS after the last change, through a per-document
+# IncrementalParser, so only the statements an edit touched are scanned and
+# parsed again. Diagnostics are pushed after every analysis. Document symbols
+# and semantic tokens are built from a per-statement summary that is kept
+# until the statement is edited, so they too cost little after a small edit.
+#
+# Characters in positions are counted in code points, which agrees with LSP's
+# UTF-16 units unless a line holds a character outside the Basic Multilingual
+# Plane.
+
+DEBOUNCE_SECONDS = 0.05
+
+SEMANTIC_TYPES = ["keyword", "variable", "number", "operator"]
+_SEMANTIC_TYPE = [SEMANTIC_TYPES.index("number" if token_type == "NUMBER" else "variable" if token_type == "IDENTIFIER"
+                                        else "keyword" if token_type in KEYWORDS.values() else "operator")
+                  for token_type in TOKEN_TYPES]  # indexed by scanner token kind
+_IDENTIFIER, _ASSIGN, _READ = (TOKEN_TYPES.index(token_type) for token_type in ("IDENTIFIER", "ASSIGN", "READ"))
+
+SEVERITY_ERROR = 1
+SYMBOL_VARIABLE = 13
+SYNC_INCREMENTAL = 2
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+def read_message(stream):
+    """Read one JSON-RPC message (Content-Length framed) from a binary stream; None at end of input."""
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            if length is None:
+                continue
+            break
+        name, _, value = line.decode("ascii").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return json.loads(stream.read(length))
+
+def write_message(stream, message):
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    stream.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+    stream.flush()
+
+def offset_of(text, line, character):
+    """Return the offset of an LSP (line, character) position in text, clamped to the text."""
+    start = 0
+    for _ in range(line):
+        start = text.find("\n", start) + 1
+        if start == 0:
+            return len(text)
+    end = text.find("\n", start)
+    return min(start + character, len(text) if end < 0 else end)
+
+def position_of(text, offset):
+    line = text.count("\n", 0, offset)
+    return {"line": line, "character": offset - text.rfind("\n", 0, offset) - 1}
+
+class Document:
+    """An open document: its latest text (kept by the reader thread) and its analysis (kept by the worker)."""
+    __slots__ = ('uri', 'text', 'version', 'timer', 'parser', 'analyzed', 'published', 'diagnostics', 'tokens', 'symbols',
+                 'summaries')
+
+    def __init__(self, uri, text, version):
+        self.uri = uri
+        self.text = text
+        self.version = version
+        self.timer = None
+        self.parser = IncrementalParser()
+        self.analyzed = None  # the text the analysis below is of
+        self.published = None  # the text whose diagnostics were last sent
+        self.diagnostics = []
+        self.tokens = None
+        self.symbols = None
+        self.summaries = {}  # id(segment) -> _summary() of that top-level statement
+
+class LanguageServer:
+    """Serves one client over a pair of binary streams until it sends exit."""
+
+    def __init__(self, input, output, debounce=DEBOUNCE_SECONDS):
+        self.input = input
+        self.output = output
+        self.debounce = debounce
+        self.documents = {}
+        self.lock = threading.Lock()  # guards documents and each Document's text and version
+        self.write_lock = threading.Lock()
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lsp-analysis")
+        self.shutdown_requested = False
+        self.handlers = {
+            "initialize": self.initialize,
+            "shutdown": self.shutdown,
+            "textDocument/didOpen": self.did_open,
+            "textDocument/didChange": self.did_change,
+            "textDocument/didClose": self.did_close,
+            "textDocument/documentSymbol": self.document_symbol,
+            "textDocument/semanticTokens/full": self.semantic_tokens,
+            "textDocument/semanticTokens/range": self.semantic_tokens,
+        }
+        # Answered on the worker, after any analysis queued before them.
+        self.deferred = {"textDocument/documentSymbol", "textDocument/semanticTokens/full",
+                         "textDocument/semanticTokens/range"}
+
+    def serve(self):
+        """Handle messages until exit; return the process exit code (0 if shutdown came first)."""
+        try:
+            while True:
+                message = read_message(self.input)
+                if message is None or message.get("method") == "exit":
+                    break
+                self.dispatch(message)
+        finally:
+            with self.lock:
+                for document in self.documents.values():
+                    if document.timer:
+                        document.timer.cancel()
+            self.worker.shutdown(wait=True)
+        return 0 if self.shutdown_requested else 1
+
+    def send(self, message):
+        message["jsonrpc"] = "2.0"
+        with self.write_lock:
+            write_message(self.output, message)
+
+    def dispatch(self, message):
+        method = message.get("method")
+        handler = self.handlers.get(method)
+        if "id" not in message:
+            if handler:  # unknown notifications, such as $/cancelRequest, are ignored
+                handler(message.get("params"))
+            return
+        if handler is None:
+            self.send({"id": message["id"], "error": {"code": METHOD_NOT_FOUND, "message": f"Unknown method {method}"}})
+        elif method in self.deferred:
+            self.worker.submit(self._respond, message["id"], handler, message.get("params"))
+        else:
+            self._respond(message["id"], handler, message.get("params"))
+
+    def _respond(self, id, handler, params):
+        try:
+            self.send({"id": id, "result": handler(params)})
+        except Exception as e:
+            self.send({"id": id, "error": {"code": INTERNAL_ERROR, "message": f"{type(e).__name__}: {e}"}})
+
+    def initialize(self, params):
+        return {
+            "capabilities": {
+                "textDocumentSync": {"openClose": True, "change": SYNC_INCREMENTAL},
+                "documentSymbolProvider": True,
+                "semanticTokensProvider": {"legend": {"tokenTypes": SEMANTIC_TYPES, "tokenModifiers": []},
+                                           "full": True, "range": True},
+            },
+            "serverInfo": {"name": "tiny-lsp"},
+        }
+
+    def shutdown(self, params):
+        self.shutdown_requested = True
+        return None
+
+    def did_open(self, params):
+        item = params["textDocument"]
+        document = Document(item["uri"], item["text"], item.get("version"))
+        with self.lock:
+            self.documents[document.uri] = document
+        self.worker.submit(self._analyze, document)
+
+    def did_change(self, params):
+        uri = params["textDocument"]["uri"]
+        with self.lock:
+            document = self.documents.get(uri)
+            if document is None:
+                return
+            text = document.text
+            for change in params["contentChanges"]:
+                if "range" in change:
+                    start, end = change["range"]["start"], change["range"]["end"]
+                    text = (text[:offset_of(text, start["line"], start["character"])] + change["text"]
+                            + text[offset_of(text, end["line"], end["character"]):])
+                else:
+                    text = change["text"]
+            document.text = text
+            document.version = params["textDocument"].get("version")
+            if document.timer:
+                document.timer.cancel()
+            # Typing restarts the timer, so a burst of keystrokes is analysed once.
+            document.timer = threading.Timer(self.debounce, self.worker.submit, (self._analyze, document))
+            document.timer.daemon = True
+            document.timer.start()
+
+    def did_close(self, params):
+        uri = params["textDocument"]["uri"]
+        with self.lock:
+            document = self.documents.pop(uri, None)
+            if document and document.timer:
+                document.timer.cancel()
+        self.send({"method": "textDocument/publishDiagnostics", "params": {"uri": uri, "diagnostics": []}})
+
+    def _current(self, params):
+        """Worker: the document a request is about, analysed up to its latest text."""
+        with self.lock:
+            document = self.documents.get(params["textDocument"]["uri"])
+        if document is None:
+            raise KeyError(f"{params['textDocument']['uri']} is not open")
+        self._analyze(document, publish=False)
+        return document
+
+    def _analyze(self, document, publish=True):
+        """Worker: bring the document's parser up to date and recompute its diagnostics."""
+        with self.lock:
+            if self.documents.get(document.uri) is not document:
+                return  # closed since
+            text, version = document.text, document.version
+        if document.analyzed is not text:
+            with instrument.phase("analyze") as record:
+                document.parser.update(text)
+                try:
+                    diagnostics = [self._diagnostic(text, error) for error in document.parser.errors()]
+                except RuntimeError as e:  # the scanner's error
+                    diagnostics = [self._lex_diagnostic(text, e)]
+                record.count(characters=len(text), diagnostics=len(diagnostics))
+            document.analyzed = text
+            document.diagnostics = diagnostics
+            document.tokens = document.symbols = None
+        if publish and document.published is not text:
+            document.published = text
+            self.send({"method": "textDocument/publishDiagnostics",
+                       "params": {"uri": document.uri, "version": version, "diagnostics": document.diagnostics}})
+
+    def _diagnostic(self, text, error):
+        if error.line is None:  # at the end of the input
+            start = end = position_of(text, len(text))
+        else:
+            start = {"line": error.line - 1, "character": error.column - 1}
+            end = {"line": error.line - 1, "character": error.column - 1 + len(error.token[0])}
+        message = str(error).partition(" -> ")[2] or str(error)
+        return {"range": {"start": start, "end": end}, "severity": SEVERITY_ERROR, "source": "tiny", "message": message}
+
+    def _lex_diagnostic(self, text, error):
+        match = re.search(r"at line (\d+):(\d+)", str(error))
+        start = ({"line": int(match[1]) - 1, "character": int(match[2]) - 1} if match
+                 else position_of(text, 0))
+        end = {"line": start["line"], "character": start["character"] + 1}
+        return {"range": {"start": start, "end": end}, "severity": SEVERITY_ERROR, "source": "tiny", "message": str(error)}
+
+    def _statements(self, document, first_line=0, last_line=None):
+        """Worker: yield (segment, first line, first column) for each top-level statement that scanned.
+
+        With first_line and last_line, only the statements overlapping those lines.
+        """
+        parser = document.parser
+        source = parser.source
+        line = offset = 0
+        for segment, length in zip(parser.segments, parser.lengths):
+            if last_line is not None and line > last_line:
+                break
+            end_line = line + segment.text.count("\n")
+            if end_line >= first_line and segment.tokens and segment.status != LEX_ERROR:
+                yield segment, line, offset - source.rfind("\n", 0, offset) - 1
+            line = end_line
+            offset += length
+
+    def _summary(self, document, segment):
+        """Worker: one statement's semantic token data, symbol uses and last token position, cached while it is unchanged.
+
+        Positions are relative to the statement: lines count from its first
+        line, and characters on that line from where it starts.
+        """
+        entry = document.summaries.get(id(segment))
+        if entry is not None and entry[0] is segment:
+            return entry
+        buffer = scan(segment.text)
+        text, kinds, starts, ends, lines = buffer.source, buffer.kinds, buffer.starts, buffer.ends, buffer.lines
+        data, uses = [], []
+        previous_line = previous_character = 0
+        previous_kind = None
+        for index in range(len(buffer)):
+            line, start, kind = lines[index] - 1, starts[index], kinds[index]
+            character = start - text.rfind("\n", 0, start) - 1
+            data.extend((line - previous_line, character - previous_character if line == previous_line else character,
+                         ends[index] - start, _SEMANTIC_TYPE[kind], 0))
+            if kind == _ASSIGN and previous_kind == _IDENTIFIER:
+                uses.append((text[starts[index - 1]:ends[index - 1]], "assigned", previous_line, previous_character))
+            elif kind == _IDENTIFIER and previous_kind == _READ:
+                uses.append((text[start:ends[index]], "read", line, character))
+            previous_line, previous_character, previous_kind = line, character, kind
+        entry = document.summaries[id(segment)] = (segment, data, uses, previous_line, previous_character)
+        return entry
+
+    def semantic_tokens(self, params):
+        """Tokens of the whole document, or of the statements overlapping a range."""
+        document = self._current(params)
+        if "range" in params:
+            with instrument.phase("semantic_tokens"):
+                return {"data": self._semantic_data(document, params["range"]["start"]["line"], params["range"]["end"]["line"])}
+        if document.tokens is None:
+            with instrument.phase("semantic_tokens"):
+                document.tokens = self._semantic_data(document)
+        return {"data": document.tokens}
+
+    def _semantic_data(self, document, first_line=0, last_line=None):
+        data = []
+        summaries = {}
+        previous_line = previous_character = 0
+        for segment, line, column in self._statements(document, first_line, last_line):
+            entry = summaries[id(segment)] = self._summary(document, segment)
+            _, segment_data, _, last_line_in, last_character = entry
+            # Only the statement's first token is placed relative to the one before it.
+            token_line = line + segment_data[0]
+            character = segment_data[1] + (column if segment_data[0] == 0 else 0)
+            data.append(token_line - previous_line)
+            data.append(character - previous_character if token_line == previous_line else character)
+            data.extend(segment_data[2:])
+            previous_line = line + last_line_in
+            previous_character = last_character + (column if last_line_in == 0 else 0)
+        if last_line is None:
+            document.summaries = summaries  # drops statements that are gone
+        return data
+
+    def document_symbol(self, params):
+        """One Variable symbol per identifier that is assigned or read, at its first such use."""
+        document = self._current(params)
+        if document.symbols is not None:
+            return document.symbols
+        with instrument.phase("symbols") as record:
+            document.symbols = self._symbols(document)
+            record.count(symbols=len(document.symbols))
+        return document.symbols
+
+    def _symbols(self, document):
+        symbols = {}
+        uses = {}
+        summaries = {}
+        for segment, line, column in self._statements(document):
+            entry = summaries[id(segment)] = self._summary(document, segment)
+            for name, how, use_line, character in entry[2]:
+                if name not in symbols:
+                    character += column if use_line == 0 else 0
+                    where = {"start": {"line": line + use_line, "character": character},
+                             "end": {"line": line + use_line, "character": character + len(name)}}
+                    symbols[name] = {"name": name, "kind": SYMBOL_VARIABLE, "range": where, "selectionRange": where}
+                    uses[name] = []
+                if how not in uses[name]:
+                    uses[name].append(how)
+        document.summaries = summaries
+        for name, symbol in symbols.items():
+            symbol["detail"] = ", ".join(uses[name])
+        return list(symbols.values())
+
+def main(argv=None):
+    import argparse
+    arg_parser = argparse.ArgumentParser(prog="python lsp.py", description="TINY language server over stdin and stdout.")
+    arg_parser.add_argument("--profile", action="store_true",
+                            help="time each phase and print a breakdown to stderr on exit")
+    options = arg_parser.parse_args(argv)
+    if not options.profile:
+        return LanguageServer(sys.stdin.buffer, sys.stdout.buffer).serve()
+    # stdout carries the protocol, so the breakdown goes to stderr.
+    with instrument.Recorder() as recorder:
+        status = LanguageServer(sys.stdin.buffer, sys.stdout.buffer).serve()
+    print(instrument.format_totals(recorder.totals()), file=sys.stderr)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,40 @@
 import os
 import io 
 import sys
-import csv
-import docx
+import queue
+import threading
 import tkinter as tk
-from graphviz import Digraph
-from PIL import Image, ImageTk, ImageDraw, ImageOps
 from tkinter import scrolledtext, ttk, messagebox, Menu, filedialog
-
-from scanner import tokenize
-from parser import TokenStream, parse_program, SyntaxTreeNode 
-from visualizer import TreeVisualizer
+from concurrent.futures import ThreadPoolExecutor, CancelledError, wait
+
+# docx, csv, graphviz, PIL and multiprocessing are imported where they are
+# first needed, so the editor window opens without loading them.
+from visualizer import TreeVisualizer, RenderCache, EXPORT_FORMATS, render_png, render_cmapx, image_map
+from layout import TreeLayout
+from cache import ParseCache
+from incremental import IncrementalParser
+from tokenview import TokenTable
+from highlight import SyntaxHighlighter
+from tileview import TilePyramid, TileViewer
+from collapse import collapse_tree, expand, NODE_BUDGET
+from perfview import PerformancePanel
+import instrument
+
+PARSE_POLL_MS = 50
+# Graphviz output the tree view needs, and the function that renders it in the process pool.
+POOL_RENDERERS = {'png': render_png, 'cmapx': render_cmapx}
+IMAGE_BORDER = 10
+
+def load_tree_image(png_data):
+    """Decode Graphviz PNG output and add the white border drawn around the tree."""
+    from PIL import Image
+    return add_tree_border(Image.open(io.BytesIO(png_data)))
+
+def add_tree_border(image):
+    from PIL import ImageOps
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+    return ImageOps.expand(image, border=IMAGE_BORDER, fill='white')
 
 class CodeEditorApp:
     def __init__(self, root):
@@ -21,8 +45,30 @@ class CodeEditorApp:
         self.current_theme = "light"
         self.current_dot_object = None 
         self.original_pil_image = None
-        self.tree_image_photo = None 
         self.tokens_list = None
+        self.parse_cache = ParseCache()
+        self.render_cache = RenderCache()
+        self.incremental_parser = IncrementalParser()
+        # One worker thread runs scan/parse/layout jobs in order; Graphviz
+        # rasterisation goes to a process pool, created on first use.
+        self.parse_executor = ThreadPoolExecutor(max_workers=1)
+        self.render_executor = None
+        # Every job posts (cancel, kind, payload) to parse_events; one poller
+        # on the main thread drains it while parse_jobs are still running.
+        self.parse_events = queue.Queue()
+        self.parse_cancel = None
+        self.parse_jobs = 0
+        self.parse_poller = None
+        self.tree_backend = tk.StringVar(value="graphviz")
+        self.performance_panel = None
+        # The tree view draws a collapsed view of parse_tree_root: at most
+        # tree_node_budget nodes (0 for all), plus the children revealed by
+        # clicking summary nodes (expanded_nodes, see collapse.expand).
+        self.tree_node_budget = tk.IntVar(value=NODE_BUDGET)
+        self.parse_tree_root = None
+        self.tree_summaries = []
+        self.tree_image_map = []  # (href, box) of each summary node in the Graphviz image
+        self.expanded_nodes = {}
 
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
@@ -72,6 +118,13 @@ class CodeEditorApp:
         )
         self.return_to_editor_btn.pack(side=tk.LEFT, padx=(0, 10))
 
+        self.zoom_in_btn = ttk.Button(tree_view_buttons_panel, text="Zoom In", command=lambda: self.tree_viewer.zoom(1))
+        self.zoom_in_btn.pack(side=tk.LEFT, padx=(0, 10))
+        self.zoom_out_btn = ttk.Button(tree_view_buttons_panel, text="Zoom Out", command=lambda: self.tree_viewer.zoom(-1))
+        self.zoom_out_btn.pack(side=tk.LEFT, padx=(0, 10))
+        self.fit_btn = ttk.Button(tree_view_buttons_panel, text="Fit", command=lambda: self.tree_viewer.fit())
+        self.fit_btn.pack(side=tk.LEFT)
+
         self.tree_image_container_frame = ttk.Frame(self.tree_view_frame, relief=tk.SUNKEN, borderwidth=1)
         self.tree_image_container_frame.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
         self.tree_image_container_frame.columnconfigure(0, weight=1)
@@ -79,6 +132,7 @@ class CodeEditorApp:
 
         self.canvas = tk.Canvas(self.tree_image_container_frame, highlightthickness=0) 
         self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.tree_viewer = TileViewer(self.canvas, on_click=self._on_tree_click)
         
         self.canvas.bind("<Configure>", self._on_canvas_configure)
         
@@ -88,34 +142,26 @@ class CodeEditorApp:
         self.editor_view_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
         self.root.title("TINY Language Editor - Editor")
 
-        if hasattr(self, 'canvas') and self.canvas:
-            self.canvas.delete("all")
-        self.tree_image_photo = None
+        if hasattr(self, 'tree_viewer'):
+            self.tree_viewer.clear()
         self.original_pil_image = None
 
 
-    def show_tree_view(self):
-        """Show the tree view and hide the editor view."""
+    def show_tree_view(self, pyramid):
+        """Show the tree view, with the TilePyramid the background worker rendered, and hide the editor view."""
         if not self.current_dot_object:
             messagebox.showinfo("No Tree", "No parse tree has been generated yet.")
             return
 
         try:
-            png_data = self.current_dot_object.pipe(format='png') 
-            if not png_data:
-                messagebox.showerror("Tree Display Error", "Graphviz returned empty PNG data.")
-                self.update_output("Error: Graphviz returned empty PNG data.", clear=False)
-                return
-
             self.editor_view_frame.grid_remove()
             self.tree_view_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
             self.root.title("TINY Language Editor - Parse Tree View")
             
-            self.original_pil_image = Image.open(io.BytesIO(png_data))
-            self.original_pil_image = ImageOps.expand(self.original_pil_image, border=10, fill='white')
+            self.original_pil_image = pyramid.levels[0]
             
             self.root.update_idletasks() 
-            self._resize_and_display_tree_image()
+            self.tree_viewer.set_pyramid(pyramid)
 
         except Exception as e:
             messagebox.showerror("Tree Display Error", f"Could not generate or display parse tree image: {e}")
@@ -124,59 +170,21 @@ class CodeEditorApp:
             self.show_editor_view()
 
     def _on_canvas_configure(self, event):
-        """Handle canvas resize events by rescaling and redrawing the image."""
+        """Handle canvas resize events by scheduling a (debounced) redraw of the visible tiles."""
         if self.original_pil_image and self.tree_view_frame.winfo_ismapped():
             if event.width > 1 and event.height > 1:
-                 self._resize_and_display_tree_image()
-
-    def _resize_and_display_tree_image(self):
-        """Resizes the stored original PIL image to fit the canvas, preserving aspect ratio, and displays it."""
-        if not self.original_pil_image:
-            if hasattr(self, 'canvas') and self.canvas:
-                self.canvas.delete("all")
-            return
-
-        canvas_width = self.canvas.winfo_width()
-        canvas_height = self.canvas.winfo_height()
-
-        if canvas_width <= 1 or canvas_height <= 1:
-            return
-
-        img_width, img_height = self.original_pil_image.size
-
-        if img_width == 0 or img_height == 0: 
-            return
-
-        width_scale = canvas_width / img_width
-        height_scale = canvas_height / img_height
-        scale = min(width_scale, height_scale)
-
-        new_width = int(img_width * scale)
-        new_height = int(img_height * scale)
-
-        if new_width < 1 or new_height < 1: 
-            return 
-
-        try:
-            resized_image = self.original_pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        except AttributeError:
-            resized_image = self.original_pil_image.resize((new_width, new_height), Image.LANCZOS)
-
-        self.tree_image_photo = ImageTk.PhotoImage(resized_image)
-        
-        self.canvas.delete("all")
-
-        x_pos = (canvas_width - new_width) // 2
-        y_pos = (canvas_height - new_height) // 2
-        
-        self.canvas.create_image(x_pos, y_pos, anchor=tk.NW, image=self.tree_image_photo)
-
+                self.tree_viewer.schedule_update()
 
     def on_close(self):
         """Handle application closing, ensuring memory is freed."""
-        if hasattr(self, 'canvas') and self.canvas:
-            self.canvas.delete("all")
-        self.tree_image_photo = None
+        self.cancel_parse()
+        self.parse_executor.shutdown(wait=False, cancel_futures=True)
+        if self.render_executor:
+            self.render_executor.shutdown(wait=False, cancel_futures=True)
+        if hasattr(self, 'tree_viewer'):
+            self.tree_viewer.clear()
+        if self.performance_panel and self.performance_panel.winfo_exists():
+            self.performance_panel.close()
         self.original_pil_image = None 
         self.current_dot_object = None
 
@@ -196,6 +204,14 @@ class CodeEditorApp:
         view_menu = Menu(menubar, tearoff=0)
         menubar.add_cascade(label="View", menu=view_menu)
         view_menu.add_command(label="Toggle Light/Dark Mode", command=self.toggle_theme)
+        view_menu.add_command(label="Performance", command=self.show_performance_panel)
+        view_menu.add_separator()
+        view_menu.add_radiobutton(label="Tree Layout: Graphviz", variable=self.tree_backend, value="graphviz")
+        view_menu.add_radiobutton(label="Tree Layout: Built-in", variable=self.tree_backend, value="tidy")
+        view_menu.add_separator()
+        for budget in (200, 500, 2000):
+            view_menu.add_radiobutton(label=f"Tree Node Budget: {budget}", variable=self.tree_node_budget, value=budget)
+        view_menu.add_radiobutton(label="Tree Node Budget: Unlimited", variable=self.tree_node_budget, value=0)
 
         self.export_main_menu = Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Export", menu=self.export_main_menu)
@@ -204,12 +220,21 @@ class CodeEditorApp:
         self.export_main_menu.add_cascade(label="Export Tree", menu=self.export_tree_submenu)
         self.export_tree_submenu.add_command(label="Export as PNG", command=self.export_tree_as_png)
         self.export_tree_submenu.add_command(label="Export as PDF", command=self.export_tree_as_pdf)
+        self.export_tree_submenu.add_command(label="Export as SVG", command=self.export_tree_as_svg)
+        self.export_tree_submenu.add_command(label="Export PNG, PDF and SVG...", command=self.export_tree_all_formats)
 
         self.export_tokens_submenu = Menu(self.export_main_menu, tearoff=0)
         self.export_main_menu.add_cascade(label="Export Tokens List", menu=self.export_tokens_submenu)
         self.export_tokens_submenu.add_command(label="Export as TXT", command=self.export_tokens_as_txt)
         self.export_tokens_submenu.add_command(label="Export as CSV", command=self.export_tokens_as_csv)
 
+    def show_performance_panel(self):
+        """Open (or raise) the window listing how long each pipeline phase took."""
+        if self.performance_panel and self.performance_panel.winfo_exists():
+            self.performance_panel.lift()
+        else:
+            self.performance_panel = PerformancePanel(self.root)
+
     def _update_export_menu_states(self):
         """Update the state of export menu items based on available data."""
         if not hasattr(self, 'export_main_menu'): 
@@ -227,6 +252,8 @@ class CodeEditorApp:
         try:
             self.export_tree_submenu.entryconfig("Export as PNG", state=tree_export_state)
             self.export_tree_submenu.entryconfig("Export as PDF", state=tree_export_state)
+            self.export_tree_submenu.entryconfig("Export as SVG", state=tree_export_state)
+            self.export_tree_submenu.entryconfig("Export PNG, PDF and SVG...", state=tree_export_state)
             self.export_main_menu.entryconfig("Export Tree", state=tree_export_state)
         except tk.TclError:
             pass 
@@ -243,6 +270,7 @@ class CodeEditorApp:
                 with open(filepath, "r", encoding="utf-8") as f:
                     content = f.read()
             elif filepath.endswith(".docx"):
+                import docx
                 doc = docx.Document(filepath)
                 full_text = []
                 for para in doc.paragraphs:
@@ -318,6 +346,8 @@ class CodeEditorApp:
 
         if hasattr(self, 'code_editor'):
             self.code_editor.config(bg=editor_bg, fg=editor_fg, insertbackground=insert_bg, selectbackground=select_bg)
+            self.highlighter.configure(self.current_theme)
+            self.code_editor.tag_configure("syntax_error", underline=True, foreground=error_color)
         if hasattr(self, 'output_area'):
             self.output_area.config(bg=output_bg, fg=output_fg)
             self.output_area.tag_configure("error", foreground=error_color)
@@ -325,6 +355,7 @@ class CodeEditorApp:
             self.output_area.tag_configure("info", foreground=output_fg)
         if hasattr(self, 'output_label'): 
             self.output_label.config(background=bg_color, foreground=text_color)
+        style.configure("Treeview", background=output_bg, fieldbackground=output_bg, foreground=output_fg)
         
         if hasattr(self, 'tree_image_container_frame'):
             self.tree_image_container_frame.config(style="TreeContainer.TFrame") 
@@ -380,6 +411,8 @@ class CodeEditorApp:
 
         self.code_editor.grid(row=0, column=0, sticky="nsew")
         self.code_editor.bind("<Button-3>", self.show_editor_context_menu)
+        self.code_editor.bind("<<Modified>>", self._on_editor_modified)
+        self.highlighter = SyntaxHighlighter(self.code_editor, self.code_editor.vbar)
 
     def create_bottom_panel(self, parent_frame):
         """Create the bottom panel with action buttons within the given parent frame."""
@@ -425,11 +458,16 @@ class CodeEditorApp:
         self.output_area.grid(row=1, column=0, sticky="nsew")
         self.output_area.config(state=tk.DISABLED)
 
+        output_frame.columnconfigure(1, weight=1)
+        self.token_table = TokenTable(output_frame)
+        self.token_table.grid(row=0, column=1, rowspan=2, sticky="nsew", padx=(10, 0))
+
     def erase_content(self):
         """Clear the content of the code editor."""
         self.code_editor.delete(1.0, tk.END)
         self.update_output("Editor content cleared.", message_type="info")
         self.tokens_list = None
+        self.token_table.clear()
         self._update_export_menu_states()
 
     def update_output(self, text, clear=True, message_type="info"):
@@ -450,122 +488,396 @@ class CodeEditorApp:
         self.output_area.see(tk.END) 
 
     def parse_code(self):
-        """Run the scanner and parser on the code in the editor."""
-        code = self.code_editor.get(1.0, tk.END).strip()
-        if not code:
+        """Start scanning, parsing and rendering the code in the editor on the background worker."""
+        code = self.code_editor.get(1.0, tk.END).rstrip()
+        if not code.strip():
             messagebox.showwarning("Empty Code", "Please enter some code to parse.")
             return
 
+        self.cancel_parse()
+        self.code_editor.tag_remove("syntax_error", 1.0, tk.END)
         self.tokens_list = None
+        self.token_table.clear()
         self.current_dot_object = None 
         self._update_export_menu_states()
 
         self.update_output("Starting scanning and parsing process...", message_type="info") 
-        self.root.update_idletasks()
+
+        self.expanded_nodes = {}
+        self.parse_cancel = self._start_job(self._parse_pipeline, code, self.tree_backend.get(), self.tree_node_budget.get())
+
+    def _start_job(self, pipeline, *args):
+        """Run pipeline(*args, cancel) on the worker, polling for its events; returns its cancel event."""
+        cancel = threading.Event()
+        self.parse_jobs += 1
+        self.parse_executor.submit(pipeline, *args, cancel)
+        if self.parse_poller is None:
+            self.parse_poller = self.root.after(PARSE_POLL_MS, self._poll_parse_events)
+        return cancel
+
+    def cancel_parse(self):
+        """Cancel the running parse job, if any; its remaining results are discarded."""
+        if self.parse_cancel and not self.parse_cancel.is_set():
+            self.parse_cancel.set()
+            self.update_output("Parsing cancelled.", clear=False, message_type="info")
+        self.parse_cancel = None
+
+    def _on_editor_modified(self, event):
+        """Editing the code invalidates a parse that is still running, and re-highlights what is on screen."""
+        if self.code_editor.edit_modified():
+            self.cancel_parse()
+            self.highlighter.schedule(int(self.code_editor.index(tk.INSERT).split(".")[0]))
+            self.code_editor.edit_modified(False)
+
+    def _parse_pipeline(self, code, backend, budget, cancel):
+        """Worker thread: scan, parse, lay out and rasterise, posting events for the UI.
+
+        Never touches Tk; everything the UI needs goes through parse_events
+        and is picked up on the main thread by _poll_parse_events.
+        """
+        def post(kind, payload=None):
+            self.parse_events.put((cancel, kind, payload))
+
+        def check_cancelled():
+            if cancel.is_set():
+                raise CancelledError()
 
         try:
-            self.update_output("\nScanning code...", clear=False, message_type="info")
-            self.root.update_idletasks() 
-            tokens = tokenize(code)
+            with instrument.phase("cache_lookup") as record:
+                cached = self.parse_cache.get(code)
+                record.count(hit=cached is not None)
+            if cached is not None:
+                tokens, parse_tree_root = cached
+            else:
+                post("progress", ("\nScanning code...", "info"))
+                with instrument.phase("tokenize") as record:
+                    # Only the statements changed since the last parse are re-scanned and re-parsed.
+                    rebuilt = self.incremental_parser.update(code)
+                    tokens = self.incremental_parser.tokens()
+                    record.count(characters=len(code), tokens=len(tokens))
+            check_cancelled()
+            post("tokens", tokens)
+            if not tokens:
+                return
+
+            if cached is not None:
+                post("progress", ("\nLoaded tokens and parse tree from cache.", "success"))
+            else:
+                post("progress", ("\nParsing tokens...", "info"))
+                try:
+                    with instrument.phase("parse") as record:
+                        parse_tree_root = self.incremental_parser.tree()
+                        record.count(statements=len(parse_tree_root.body.statements))
+                except SyntaxError:
+                    # Re-parse only the failing statements, recovering from each error, to report them all at once.
+                    with instrument.phase("recover") as record:
+                        errors = self.incremental_parser.errors()
+                        record.count(errors=len(errors))
+                    if not errors:
+                        raise
+                    post("syntax_errors", errors)
+                    return
+                # Storing an entry re-scans and flattens the whole program, so it is
+                # only worth it when the whole text was parsed afresh anyway (a new
+                # or imported file); after a small edit it would undo the
+                # incremental parse.
+                if rebuilt == (0, len(self.incremental_parser.segments)):
+                    with instrument.phase("cache_store"):
+                        self.parse_cache.put(code, tokens, parse_tree_root)
+                post("progress", ("Parsing complete.", "success"))
+            post("progress", (f"Parse cache: {self.parse_cache.hits} hits, {self.parse_cache.misses} misses "
+                              f"({self.parse_cache.hit_rate:.0%} hit rate).", "info"))
+            check_cancelled()
+
+            image = self._render_view(parse_tree_root, {}, backend, budget, post, check_cancelled, cancel)
+            if image:
+                post("image", image)
+        except CancelledError:
+            pass
+        except Exception as e:
+            post("error", e)
+        finally:
+            post("done")
+
+    def _expand_pipeline(self, root, expanded, backend, budget, cancel):
+        """Worker thread: re-render the tree view after a summary node was expanded."""
+        def post(kind, payload=None):
+            self.parse_events.put((cancel, kind, payload))
+
+        def check_cancelled():
+            if cancel.is_set():
+                raise CancelledError()
+
+        try:
+            image = self._render_view(root, expanded, backend, budget, post, check_cancelled, cancel)
+            if image:
+                post("view", image)
+        except CancelledError:
+            pass
+        except Exception as e:
+            post("error", e)
+        finally:
+            post("done")
+
+    def _export_pipeline(self, root, backend, paths, cancel):
+        """Worker thread: render the whole tree, not the collapsed view, and write it to paths ({format: path})."""
+        try:
+            with instrument.phase("render_tree") as record:
+                tree = TreeVisualizer(backend=backend).render_tree(root)
+                record.count(backend=backend)
+            if not tree:
+                raise RuntimeError("could not generate the parse tree graph")
+            with instrument.phase("export") as record:
+                results = self.render_cache.export(tree, tuple(paths))
+                record.count(formats=len(results))
+            for format, data in results.items():
+                with open(paths[format], "wb") as file:
+                    file.write(data)
+            self.parse_events.put((cancel, "exported", list(paths.values())))
+        except Exception as e:
+            self.parse_events.put((cancel, "export_error", e))
+        finally:
+            self.parse_events.put((cancel, "done", None))
+
+    def _render_view(self, root, expanded, backend, budget, post, check_cancelled, cancel):
+        """Worker thread: collapse, lay out and rasterise the tree; returns (TilePyramid, image map) or None.
+
+        Only the collapsed view is laid out, so the cost is bounded by the
+        node budget rather than by the size of the program. The image map
+        lists the summary nodes of a Graphviz rendering, so a click can be
+        resolved without running Graphviz on the UI thread.
+        """
+        with instrument.phase("collapse") as record:
+            view, summaries = collapse_tree(root, budget or None, expanded=expanded)
+            record.count(summaries=len(summaries))
+        with instrument.phase("render_tree") as record:
+            dot = TreeVisualizer(backend=backend).render_tree(view)
+            record.count(backend=backend)
+        check_cancelled()
+        post("tree", (root, summaries, dot))
+        if not dot:
+            return None
+        areas = []
+        if isinstance(dot, TreeLayout):
+            with instrument.phase("draw") as record:
+                # The built-in layout draws straight onto a PIL image; no subprocess, no PNG round trip.
+                image = add_tree_border(dot.to_image())
+                record.count(nodes=len(dot.labels))
+        else:
+            with instrument.phase("graphviz") as record:
+                # The image map is only needed if there are summary nodes to click.
+                rendered = self._render_in_pool(dot.source, ('png', 'cmapx') if summaries else ('png',), cancel)
+                png_data = rendered['png']
+                record.count(dot_bytes=len(dot.source), png_bytes=len(png_data or b""))
+            if summaries:
+                areas = [area for area in image_map(rendered['cmapx'].decode()) if area[0].startswith("summary")]
+            if not png_data:
+                post("progress", ("Empty PNG data returned for the tree.", "error"))
+                return None
+            with instrument.phase("decode"):
+                image = load_tree_image(png_data)
+        # Decoding and building the zoom levels are PIL-only, so they stay off the UI thread too.
+        with instrument.phase("pyramid") as record:
+            pyramid = TilePyramid(image)
+            record.count(width=image.width, height=image.height, levels=len(pyramid.levels))
+        check_cancelled()
+        return pyramid, areas
+
+    def _render_in_pool(self, source, formats, cancel):
+        """Worker thread: render DOT source in each of formats in the process pool, giving up if cancelled.
+
+        Returns {format: bytes}; formats missing from the RenderCache are rendered side by side.
+        """
+        results = {format: self.render_cache.get(source, format) for format in formats}
+        missing = [format for format, data in results.items() if data is None]
+        if not missing:
+            return results
+        if self.render_executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn, not fork: forking a process that is running Tk and threads is unsafe.
+            self.render_executor = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+        futures = {format: self.render_executor.submit(POOL_RENDERERS[format], source) for format in missing}
+        while wait(futures.values(), timeout=0.1).not_done:
+            if cancel.is_set():
+                for future in futures.values():
+                    future.cancel()
+                raise CancelledError()
+        for format, future in futures.items():
+            results[format] = future.result()
+            self.render_cache.put(source, format, results[format])
+        return results
+
+    def _poll_parse_events(self):
+        """Main thread: apply the events posted by the worker, until no job is left running.
+
+        There is a single poller for all jobs, so no event is ever taken off
+        the queue by one job's poller and lost to another's; only the events
+        of cancelled jobs are dropped.
+        """
+        while True:
+            try:
+                job, kind, payload = self.parse_events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "done":
+                self.parse_jobs -= 1
+                if self.parse_cancel is job:
+                    self.parse_cancel = None
+                self._update_export_menu_states() # Update menu states after all outcomes
+                continue
+            if job.is_set():
+                continue
+            try:
+                self._handle_parse_event(kind, payload)
+            except Exception as e:
+                self._show_parse_error(e)
+        if self.parse_jobs:
+            self.parse_poller = self.root.after(PARSE_POLL_MS, self._poll_parse_events)
+        else:
+            self.parse_poller = None
+
+    def _handle_parse_event(self, kind, payload):
+        if kind == "progress":
+            text, message_type = payload
+            self.update_output(text, clear=False, message_type=message_type)
+        elif kind == "tokens":
+            tokens = payload
             if not tokens:
                 self.update_output("No tokens found or scanner error.", clear=False, message_type="error")
-                self.root.update_idletasks() 
-                self._update_export_menu_states() 
                 return
-            
             self.tokens_list = tokens
-            self.update_output(f"Scanning complete. Found {len(tokens)} tokens.", clear=False, message_type="info")
-            self.root.update_idletasks() 
-            self.update_output("List of tokens:", clear=False, message_type="info")
-            for value, token_type in tokens:
-                self.update_output(f"  {value} : {token_type}", clear=False, message_type="info")
-            self.root.update_idletasks() 
-
-            self.update_output("\nParsing tokens...", clear=False, message_type="info")
-            self.root.update_idletasks() 
-            token_stream = TokenStream(tokens)
-            parse_tree_root = parse_program(token_stream)
-            self.update_output("Parsing complete.", clear=False, message_type="success")
-            self.root.update_idletasks() 
-            
-            visualizer = TreeVisualizer() 
-            self.current_dot_object = visualizer.render_tree(parse_tree_root) 
-            
+            self.token_table.set_tokens(tokens)
+            self.update_output(f"Scanning complete. Found {len(tokens)} tokens (listed in the Tokens panel).", clear=False, message_type="info")
+        elif kind == "tree":
+            self.parse_tree_root, self.tree_summaries, self.current_dot_object = payload
             if self.current_dot_object:
                 self.update_output("Parse tree generated.", clear=False, message_type="success") 
-                self.update_output("Success! Redirecting to Tree View...", clear=False, message_type="success")
-                self.root.update_idletasks() 
-                
-                self.code_editor.delete(1.0, tk.END)
-                self.output_area.config(state=tk.NORMAL)
-                self.output_area.delete(1.0, tk.END)
-                self.output_area.config(state=tk.DISABLED)
-                
-                self.show_tree_view()
+                self.update_output("Rendering tree image...", clear=False, message_type="info")
             else:
                 self.update_output("Could not generate parse tree graph.", clear=False, message_type="error")
-                self.root.update_idletasks() 
-                # self.current_dot_object is already None or will be
-        except RuntimeError as e: 
-            self.update_output(f"Scanner Error: {e}", clear=False, message_type="error")
+        elif kind == "image":
+            pyramid, self.tree_image_map = payload
+            self.parse_cancel = None  # finished; clearing the editor below must not cancel it
+            self.update_output("Success! Redirecting to Tree View...", clear=False, message_type="success")
             self.root.update_idletasks() 
+
+            self.code_editor.delete(1.0, tk.END)
+            self.output_area.config(state=tk.NORMAL)
+            self.output_area.delete(1.0, tk.END)
+            self.output_area.config(state=tk.DISABLED)
+
+            self.show_tree_view(pyramid)
+        elif kind == "view":
+            pyramid, self.tree_image_map = payload
+            self.parse_cancel = None
+            self.original_pil_image = pyramid.levels[0]
+            self.tree_viewer.set_pyramid(pyramid, keep_view=True)
+            self._update_export_menu_states()
+        elif kind == "exported":
+            messagebox.showinfo("Export Successful", "Parse tree saved as " + ", ".join(payload))
+        elif kind == "export_error":
+            messagebox.showerror("Export Error", f"Failed to export the parse tree: {payload}")
+        elif kind == "syntax_errors":
+            self._show_syntax_errors(payload)
+        elif kind == "error":
+            self._show_parse_error(payload)
+
+    def _on_tree_click(self, x, y):
+        """Expand the summary node under a click on the tree image, if there is one."""
+        tree = self.current_dot_object
+        if not tree:
+            return
+        x, y = x - IMAGE_BORDER, y - IMAGE_BORDER
+        summary = None
+        if isinstance(tree, TreeLayout):
+            index = tree.node_at(x, y)
+            if index >= 0 and tree.nodes[index].kind == 'summary':
+                summary = tree.nodes[index]
+        else:
+            # Summary nodes carry a URL, so Graphviz's image map (rendered on the worker) gives their boxes in PNG pixels.
+            for href, (left, top, right, bottom) in self.tree_image_map:
+                if left <= x <= right and top <= y <= bottom:
+                    summary = self.tree_summaries[int(href[len("summary"):])]
+                    break
+        if summary is not None:
+            self.expand_summary(summary)
+
+    def expand_summary(self, summary):
+        """Show the children hidden behind a summary node, re-rendering the tree view in the background."""
+        expand(self.expanded_nodes, summary, self.tree_node_budget.get() or None)
+        self.cancel_parse()
+        self.parse_cancel = self._start_job(self._expand_pipeline, self.parse_tree_root, dict(self.expanded_nodes),
+                                            self.tree_backend.get(), self.tree_node_budget.get())
+
+    def _show_parse_error(self, e):
+        if isinstance(e, RuntimeError):
+            self.update_output(f"Scanner Error: {e}", clear=False, message_type="error")
             messagebox.showerror("Scanner Error", str(e))
-            self.tokens_list = None # Ensure tokens_list is cleared on error
-            self.current_dot_object = None
-        except SyntaxError as e: 
+        elif isinstance(e, SyntaxError):
             self.update_output(f"Parser Error: {e}", clear=False, message_type="error")
-            self.root.update_idletasks() 
             messagebox.showerror("Parser Error", str(e))
-            self.tokens_list = None # Ensure tokens_list is cleared on error
-            self.current_dot_object = None 
-        except Exception as e:
+        else:
             self.update_output(f"An unexpected error occurred: {e}", clear=False, message_type="error")
-            self.root.update_idletasks() 
             messagebox.showerror("Error", f"An unexpected error occurred: {e}")
-            self.tokens_list = None # Ensure tokens_list is cleared on error
-            self.current_dot_object = None
-        finally:
-            self._update_export_menu_states() # Update menu states after all outcomes
+        self.tokens_list = None # Ensure tokens_list is cleared on error
+        self.current_dot_object = None
 
-    def export_tree_as_png(self):
-        """Export the current parse tree as a PNG file."""
+    def _show_syntax_errors(self, errors):
+        """List every syntax error in the output and underline its token in the editor."""
+        for error in errors:
+            self.update_output(f"Parser Error: {error}", clear=False, message_type="error")
+            if error.line is not None:
+                start = f"{error.line}.{error.column - 1}"
+                self.code_editor.tag_add("syntax_error", start, f"{start}+{len(error.token[0])}c")
+        plural = "s" if len(errors) != 1 else ""
+        messagebox.showerror("Parser Error", f"Found {len(errors)} syntax error{plural}. The first:\n{errors[0]}")
+        self.tokens_list = None
+        self.current_dot_object = None
+
+    def _export_tree(self, format):
+        """Export the whole current parse tree in one format, rendering it on the background worker."""
         if not self.current_dot_object:
             messagebox.showinfo("Export Error", "No parse tree available to export.")
             return
-        
+
+        name = format.upper()
         filepath = filedialog.asksaveasfilename(
-            defaultextension=".png",
-            filetypes=[("PNG files", "*.png"), ("All files", "*.*")],
-            title="Save Parse Tree as PNG"
+            defaultextension=f".{format}",
+            filetypes=[(f"{name} files", f"*.{format}"), ("All files", "*.*")],
+            title=f"Save Parse Tree as {name}"
         )
         if not filepath:
             return
-            
-        try:
-            self.current_dot_object.render(filepath[:-4], format="png", cleanup=True) 
-            messagebox.showinfo("Export Successful", f"Parse tree saved as {filepath}")
-        except Exception as e:
-            messagebox.showerror("Export Error", f"Failed to export as PNG: {e}")
+        self._start_job(self._export_pipeline, self.parse_tree_root, self.tree_backend.get(), {format: filepath})
+
+    def export_tree_as_png(self):
+        """Export the current parse tree as a PNG file."""
+        self._export_tree("png")
 
     def export_tree_as_pdf(self):
         """Export the current parse tree as a PDF file."""
+        self._export_tree("pdf")
+
+    def export_tree_as_svg(self):
+        """Export the current parse tree as an SVG file."""
+        self._export_tree("svg")
+
+    def export_tree_all_formats(self):
+        """Export the whole current parse tree as PNG, PDF and SVG files, laying it out only once."""
         if not self.current_dot_object:
             messagebox.showinfo("Export Error", "No parse tree available to export.")
             return
 
         filepath = filedialog.asksaveasfilename(
-            defaultextension=".pdf",
-            filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")],
-            title="Save Parse Tree as PDF"
+            filetypes=[("All files", "*.*")],
+            title="Save Parse Tree as PNG, PDF and SVG (name without extension)"
         )
         if not filepath:
-            return 
-            
-        try:
-            self.current_dot_object.render(filepath[:-4], format="pdf", cleanup=True) 
-            messagebox.showinfo("Export Successful", f"Parse tree saved as {filepath}")
-        except Exception as e:
-            messagebox.showerror("Export Error", f"Failed to export as PDF: {e}")
+            return
+        base = os.path.splitext(filepath)[0]
+        self._start_job(self._export_pipeline, self.parse_tree_root, self.tree_backend.get(),
+                        {format: f"{base}.{format}" for format in EXPORT_FORMATS})
 
     def export_tokens_as_txt(self):
         """Export the current tokens list as a TXT file."""
@@ -610,6 +922,7 @@ class CodeEditorApp:
         
         try:
             with open(filepath, "w", encoding="utf-8", newline='') as f:
+                import csv
                 writer = csv.writer(f)
                 writer.writerow(["Value", "Type"]) 
                 for value, token_type in self.tokens_list:
@@ -627,4 +940,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,174 @@
+from enum import Enum
+
+class Operator(Enum):
+    LESSTHAN = '<'
+    EQUAL = '='
+    PLUS = '+'
+    MINUS = '-'
+    MULT = '*'
+    DIV = '/'
+
+class Node:
+    """Base of the typed syntax tree.
+
+    Each subclass stores its fields in __slots__ and shares a class-level
+    kind. The label and children properties rebuild the view the old
+    string-labeled SyntaxTreeNode offered, for consumers that still walk
+    trees generically.
+    """
+    __slots__ = ()
+    kind = None
+
+    @property
+    def label(self):
+        return self.kind
+
+    @property
+    def children(self):
+        return ()
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.label}>"
+
+class Program(Node):
+    __slots__ = ('body',)
+    kind = 'program'
+
+    def __init__(self, body):
+        self.body = body
+
+    @property
+    def children(self):
+        return (self.body,)
+
+class StmtSeq(Node):
+    __slots__ = ('statements',)
+    kind = 'stmt_seq'
+
+    def __init__(self, statements=None):
+        self.statements = statements if statements is not None else []
+
+    @property
+    def children(self):
+        return self.statements
+
+    def add(self, *nodes):
+        self.statements.extend(nodes)
+
+class If(Node):
+    __slots__ = ('cond', 'then_branch', 'else_branch')
+    kind = 'if'
+
+    def __init__(self, cond, then_branch, else_branch=None):
+        self.cond = cond
+        self.then_branch = then_branch
+        self.else_branch = else_branch
+
+    @property
+    def children(self):
+        if self.else_branch is None:
+            return (self.cond, self.then_branch)
+        return (self.cond, self.then_branch, self.else_branch)
+
+class Repeat(Node):
+    __slots__ = ('body', 'cond')
+    kind = 'repeat'
+
+    def __init__(self, body, cond):
+        self.body = body
+        self.cond = cond
+
+    @property
+    def children(self):
+        return (self.body, self.cond)
+
+class Assign(Node):
+    __slots__ = ('name', 'expr')
+    kind = 'assign'
+
+    def __init__(self, name, expr):
+        self.name = name
+        self.expr = expr
+
+    @property
+    def label(self):
+        return f"assign ({self.name})"
+
+    @property
+    def children(self):
+        return (self.expr,)
+
+class Read(Node):
+    __slots__ = ('name',)
+    kind = 'read'
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def label(self):
+        return f"read ({self.name})"
+
+class Write(Node):
+    __slots__ = ('expr',)
+    kind = 'write'
+
+    def __init__(self, expr):
+        self.expr = expr
+
+    @property
+    def children(self):
+        return (self.expr,)
+
+class BinOp(Node):
+    __slots__ = ('op', 'left', 'right')
+    kind = 'OP'
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    @property
+    def label(self):
+        return f"OP ({self.op.value})"
+
+    @property
+    def children(self):
+        return (self.left, self.right)
+
+class Const(Node):
+    __slots__ = ('value',)
+    kind = 'const'
+
+    def __init__(self, value):
+        self.value = value
+
+    @property
+    def label(self):
+        return f"const ({self.value})"
+
+class Id(Node):
+    __slots__ = ('name',)
+    kind = 'id'
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def label(self):
+        return f"id ({self.name})"
+
+class Error(Node):
+    """Stands in for a statement the recovering parser could not parse.
+
+    error is the ParseError reported for it; tokens start to end (exclusive)
+    are the ones skipped in its place.
+    """
+    __slots__ = ('error', 'start', 'end')
+    kind = 'error'
+
+    def __init__(self, error, start, end):
+        self.error = error
+        self.start = start
+        self.end = end
@@ -1,6 +1,9 @@
 import sys
+from nodes import Node, Operator, Program, StmtSeq, If, Repeat, Assign, Read, Write, BinOp, Const, Id, Error
+
+class SyntaxTreeNode(Node):
+    __slots__ = ('label', 'children')
 
-class SyntaxTreeNode:
     def __init__(self, label):
         self.label = label
         self.children = []
@@ -8,10 +11,29 @@ class SyntaxTreeNode:
     def add(self, *nodes):
         self.children.extend(nodes)
 
+class ParseError(SyntaxError):
+    """The SyntaxError the parser raises, with where it happened.
+
+    index is the token's index (len(tokens) at the end of input) and token
+    the token itself (None at the end). line and column are 1-based, and
+    None when the tokens do not know their source positions.
+    """
+
+    def __init__(self, message, index, token, line=None, column=None):
+        super().__init__(message)
+        self.index = index
+        self.token = token
+        self.line = line
+        self.column = column
+
+# Panic-mode recovery resumes parsing at the first of these tokens.
+SYNC_TOKENS = {"SEMICOLON", "END", "UNTIL", "ELSE"}
+
 class TokenStream:
-    def __init__(self, tokens):
+    def __init__(self, tokens, errors=None):
         self.tokens = tokens
         self.position = 0
+        self.errors = errors  # a list here turns on error recovery; see parse_program_recovering
 
     def current(self):
         return self.tokens[self.position] if self.position < len(self.tokens) else None
@@ -28,27 +50,69 @@ class TokenStream:
 
     def error(self, message):
         token = self.current()
-        token_info = f"at token {self.position + 1}: {token}" if token else "at end of input"
-        raise SyntaxError(f"Syntax error {token_info} -> {message}")
+        line = column = None
+        if not token:
+            token_info = "at end of input"
+        elif hasattr(self.tokens, "position"):
+            line, column = self.tokens.position(self.position)
+            token_info = f"at line {line}:{column} (token {self.position + 1}): {token}"
+        else:
+            token_info = f"at token {self.position + 1}: {token}"
+        raise ParseError(f"Syntax error {token_info} -> {message}", self.position, token, line, column)
+
+    def synchronize(self):
+        """Skip tokens up to the next ';', 'end', 'until' or 'else', or the end of input."""
+        tokens = self.tokens
+        while self.position < len(tokens) and tokens[self.position][1] not in SYNC_TOKENS:
+            self.position += 1
 
 def parse_program(ts):
-    node = SyntaxTreeNode("program")
-    node.add(parse_stmt_sequence(ts))
-    return node
+    return Program(parse_stmt_sequence(ts))
+
+def parse_program_recovering(tokens):
+    """Parse tokens, reporting every syntax error; return (Program, list of ParseError).
+
+    A statement that does not parse is replaced by an Error node, and
+    parsing resumes at the next ';', 'end', 'until' or 'else'. Without
+    errors the tree is the one parse_program builds, and the list is empty
+    exactly when parse_program would not raise; otherwise its first entry
+    is the error parse_program raises.
+    """
+    errors = []
+    ts = TokenStream(tokens, errors)
+    body = parse_stmt_sequence(ts)
+    while errors and ts.current():
+        # Left over from an earlier error, like the 'else' and 'end' of an if
+        # whose condition did not parse: skip to the next statement and go on.
+        while ts.current() and ts.current()[1] not in STATEMENT_START:
+            ts.advance()
+        if ts.current():
+            body.statements.extend(parse_stmt_sequence(ts).statements)
+    return Program(body), errors
 
 def parse_stmt_sequence(ts):
-    node = SyntaxTreeNode("stmt_seq")
-    node.add(parse_statement(ts))
+    statement = parse_statement if ts.errors is None else _recovering_statement
+    node = StmtSeq()
+    node.add(statement(ts))
     while ts.current() and ts.current()[1] == "SEMICOLON":
         ts.match("SEMICOLON")
 
         
         if ts.current() and ts.current()[1] in {"IF", "REPEAT", "IDENTIFIER", "READ", "WRITE"}:
-            node.add(parse_statement(ts))
+            node.add(statement(ts))
         else:
             break  
     return node
 
+def _recovering_statement(ts):
+    start = ts.position
+    try:
+        return parse_statement(ts)
+    except ParseError as e:
+        ts.errors.append(e)
+        ts.synchronize()
+        return Error(e, start, ts.position)
+
 def parse_statement(ts):
     token = ts.current()
     if not token:
@@ -76,50 +140,36 @@ def parse_if_stmt(ts):
         ts.match("ELSE")
         else_branch = parse_stmt_sequence(ts)
     ts.match("END")
-
-    node = SyntaxTreeNode("if")
-    node.add(cond, then_branch)
-    if else_branch:
-        node.add(else_branch)
-    return node
+    return If(cond, then_branch, else_branch)
 
 def parse_repeat_stmt(ts):
     ts.match("REPEAT")
     body = parse_stmt_sequence(ts)
     ts.match("UNTIL")
     cond = parse_exp(ts)
-    node = SyntaxTreeNode("repeat")
-    node.add(body, cond)
-    return node
+    return Repeat(body, cond)
 
 def parse_assign_stmt(ts):
     var = ts.match("IDENTIFIER")[0]
     ts.match("ASSIGN")
     expr = parse_exp(ts)
-    node = SyntaxTreeNode(f"assign ({var})")
-    node.add(expr)
-    return node
+    return Assign(var, expr)
 
 def parse_read_stmt(ts):
     var = ts.match("READ")
     id_token = ts.match("IDENTIFIER")[0]
-    return SyntaxTreeNode(f"read ({id_token})")
+    return Read(id_token)
 
 def parse_write_stmt(ts):
     ts.match("WRITE")
-    expr = parse_exp(ts)
-    node = SyntaxTreeNode("write")
-    node.add(expr)
-    return node
+    return Write(parse_exp(ts))
 
 def parse_exp(ts):
     left = parse_simple_exp(ts)
     if ts.current() and ts.current()[1] in ("LESSTHAN", "EQUAL"):
         op = ts.match(ts.current()[1])[0]
         right = parse_simple_exp(ts)
-        node = SyntaxTreeNode(f"OP ({op})")
-        node.add(left, right)
-        return node
+        return BinOp(Operator(op), left, right)
     return left
 
 def parse_simple_exp(ts):
@@ -127,9 +177,7 @@ def parse_simple_exp(ts):
     while ts.current() and ts.current()[1] in ("PLUS", "MINUS"):
         op = ts.match(ts.current()[1])[0]
         right = parse_term(ts)
-        new_node = SyntaxTreeNode(f"OP ({op})")
-        new_node.add(left, right)
-        left = new_node
+        left = BinOp(Operator(op), left, right)
     return left
 
 def parse_term(ts):
@@ -137,13 +185,13 @@ def parse_term(ts):
     while ts.current() and ts.current()[1] in ("MULT", "DIV"):
         op = ts.match(ts.current()[1])[0]
         right = parse_factor(ts)
-        new_node = SyntaxTreeNode(f"OP ({op})")
-        new_node.add(left, right)
-        left = new_node
+        left = BinOp(Operator(op), left, right)
     return left
 
 def parse_factor(ts):
     token = ts.current()
+    if not token:
+        ts.error("Expected NUMBER, IDENTIFIER, or (exp)")
     if token[1] == "OPENBRACKET":
         ts.match("OPENBRACKET")
         expr = parse_exp(ts)
@@ -151,9 +199,176 @@ def parse_factor(ts):
         return expr
     elif token[1] == "NUMBER":
         value = ts.match("NUMBER")[0]
-        return SyntaxTreeNode(f"const ({value})")
+        return Const(int(value))
     elif token[1] == "IDENTIFIER":
         value = ts.match("IDENTIFIER")[0]
-        return SyntaxTreeNode(f"id ({value})")
+        return Id(value)
     else:
         ts.error("Expected NUMBER, IDENTIFIER, or (exp)")
+
+# Non-recursive engine. parse_program_iterative builds the same tree as
+# parse_program, but keeps its pending work on an explicit stack of
+# continuations instead of the Python call stack, so nesting depth is bounded
+# only by memory. Each continuation takes (ts, build, stack, values): it
+# consumes tokens, pushes further continuations, and leaves finished nodes (or
+# the target name of an assignment still waiting for its expression) on
+# values. Nodes are made through a builder, so the same engine can target
+# representations other than typed node objects.
+
+STATEMENT_START = {"IF", "REPEAT", "IDENTIFIER", "READ", "WRITE"}
+
+class NodeBuilder:
+    """Builder that makes typed nodes; the default for parse_program_iterative."""
+    program = Program
+    stmt_seq = StmtSeq
+    if_stmt = If
+    repeat = Repeat
+    assign = Assign
+    read = Read
+    write = Write
+    binop = BinOp
+    const = Const
+    id = Id
+
+    @staticmethod
+    def append(seq, stmt):
+        seq.statements.append(stmt)
+
+def parse_program_iterative(ts, build=None):
+    if build is None:
+        build = NodeBuilder()
+    stack = [_stmt_sequence]
+    values = []
+    while stack:
+        stack.pop()(ts, build, stack, values)
+    return build.program(values.pop())
+
+def _stmt_sequence(ts, build, stack, values):
+    values.append(build.stmt_seq())
+    stack.append(_stmt_sequence_item)
+    stack.append(_statement)
+
+def _stmt_sequence_item(ts, build, stack, values):
+    stmt = values.pop()
+    build.append(values[-1], stmt)
+    if ts.current() and ts.current()[1] == "SEMICOLON":
+        ts.match("SEMICOLON")
+        if ts.current() and ts.current()[1] in STATEMENT_START:
+            stack.append(_stmt_sequence_item)
+            stack.append(_statement)
+
+def _statement(ts, build, stack, values):
+    token = ts.current()
+    if not token:
+        ts.error("Unexpected end of input in statement")
+    if token[1] == "IF":
+        ts.match("IF")
+        stack.append(_if_then)
+        stack.append(_exp)
+    elif token[1] == "REPEAT":
+        ts.match("REPEAT")
+        stack.append(_repeat_until)
+        stack.append(_stmt_sequence)
+    elif token[1] == "IDENTIFIER":
+        values.append(ts.match("IDENTIFIER")[0])
+        ts.match("ASSIGN")
+        stack.append(_assign_end)
+        stack.append(_exp)
+    elif token[1] == "READ":
+        ts.match("READ")
+        id_token = ts.match("IDENTIFIER")[0]
+        values.append(build.read(id_token))
+    elif token[1] == "WRITE":
+        ts.match("WRITE")
+        stack.append(_write_end)
+        stack.append(_exp)
+    else:
+        ts.error(f"Unexpected token in statement: {token}")
+
+def _if_then(ts, build, stack, values):
+    ts.match("THEN")
+    stack.append(_if_else)
+    stack.append(_stmt_sequence)
+
+def _if_else(ts, build, stack, values):
+    if ts.current() and ts.current()[1] == "ELSE":
+        ts.match("ELSE")
+        stack.append(_if_end)
+        stack.append(_stmt_sequence)
+        return
+    ts.match("END")
+    then_branch = values.pop()
+    values.append(build.if_stmt(values.pop(), then_branch))
+
+def _if_end(ts, build, stack, values):
+    ts.match("END")
+    else_branch = values.pop()
+    then_branch = values.pop()
+    values.append(build.if_stmt(values.pop(), then_branch, else_branch))
+
+def _repeat_until(ts, build, stack, values):
+    ts.match("UNTIL")
+    stack.append(_repeat_end)
+    stack.append(_exp)
+
+def _repeat_end(ts, build, stack, values):
+    cond = values.pop()
+    values.append(build.repeat(values.pop(), cond))
+
+def _assign_end(ts, build, stack, values):
+    expr = values.pop()
+    values.append(build.assign(values.pop(), expr))
+
+def _write_end(ts, build, stack, values):
+    values.append(build.write(values.pop()))
+
+# Expressions are parsed in one continuation by operator precedence, with
+# their own operand/operator stacks. A None on the operator stack marks an
+# open bracket. As in parse_exp, a comparison is non-associative: a second one
+# at the same bracket level ends that level's expression.
+OPERATOR_PRECEDENCE = {
+    "LESSTHAN": 1, "EQUAL": 1,
+    "PLUS": 2, "MINUS": 2,
+    "MULT": 3, "DIV": 3,
+}
+
+def _reduce(build, operands, operators, precedence):
+    while operators and operators[-1] is not None and operators[-1][0] >= precedence:
+        op = operators.pop()[1]
+        right = operands.pop()
+        operands.append(build.binop(op, operands.pop(), right))
+
+def _exp(ts, build, stack, values):
+    operands = []
+    operators = []
+    compared = [False]
+    while True:
+        token = ts.current()
+        while token and token[1] == "OPENBRACKET":
+            ts.match("OPENBRACKET")
+            operators.append(None)
+            compared.append(False)
+            token = ts.current()
+        if token and token[1] == "NUMBER":
+            operands.append(build.const(int(ts.match("NUMBER")[0])))
+        elif token and token[1] == "IDENTIFIER":
+            operands.append(build.id(ts.match("IDENTIFIER")[0]))
+        else:
+            ts.error("Expected NUMBER, IDENTIFIER, or (exp)")
+
+        while True:
+            token = ts.current()
+            precedence = OPERATOR_PRECEDENCE.get(token[1]) if token else None
+            if precedence is not None and not (precedence == 1 and compared[-1]):
+                _reduce(build, operands, operators, precedence)
+                if precedence == 1:
+                    compared[-1] = True
+                operators.append((precedence, Operator(ts.match(token[1])[0])))
+                break
+            _reduce(build, operands, operators, 0)
+            if len(compared) == 1:
+                values.append(operands.pop())
+                return
+            ts.match("CLOSEDBRACKET")
+            operators.pop()
+            compared.pop()
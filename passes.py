@@ -0,0 +1,329 @@
+import time
+from collections import namedtuple
+from nodes import Operator
+from ir import Instr, COMMUTATIVE, evaluate_binop
+
+# Optimisation passes over ir.IRFunction. Every pass rewrites the function in
+# place and preserves everything vm.execute can observe: the written values,
+# runtime errors (an instruction that may raise is never removed or moved)
+# and the final variable values.
+
+NAC = object()  # constant-propagation lattice bottom: "not a constant"
+
+def reverse_postorder(function):
+    order, seen = [], {function.entry}
+    stack = [(function.entry, iter(function.blocks[function.entry].targets))]
+    while stack:
+        label, successors = stack[-1]
+        for successor in successors:
+            if successor not in seen:
+                seen.add(successor)
+                stack.append((successor, iter(function.blocks[successor].targets)))
+                break
+        else:
+            stack.pop()
+            order.append(label)
+    order.reverse()
+    return order
+
+def remove_unreachable(function):
+    reachable = set(reverse_postorder(function))
+    for label in list(function.blocks):
+        if label not in reachable:
+            del function.blocks[label]
+    function.loops = [loop for loop in function.loops
+                      if loop.header in reachable and loop.preheader in reachable and loop.latch in reachable]
+    for loop in function.loops:
+        loop.blocks &= reachable
+
+def dominators(function):
+    order = reverse_postorder(function)
+    preds = function.predecessors()
+    everything = set(order)
+    dom = {label: set(everything) for label in order}
+    dom[function.entry] = {function.entry}
+    changed = True
+    while changed:
+        changed = False
+        for label in order[1:]:
+            incoming = [dom[pred] for pred in preds[label] if pred in dom]
+            new = set.intersection(*incoming) if incoming else set()
+            new.add(label)
+            if new != dom[label]:
+                dom[label] = new
+                changed = True
+    return dom
+
+def liveness(function):
+    """Return {label: live-in set}. User variables are live at halt."""
+    use, define = {}, {}
+    for label, block in function.blocks.items():
+        block_use, block_def = set(), set()
+        for instr in block.instrs:
+            block_use.update(arg for arg in instr.uses() if arg not in block_def)
+            if instr.dest is not None:
+                block_def.add(instr.dest)
+        if isinstance(block.cond, str) and block.cond not in block_def:
+            block_use.add(block.cond)
+        use[label], define[label] = block_use, block_def
+    exit_live = set(function.variables)
+    live_in = {label: set() for label in function.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for label in reversed(reverse_postorder(function)):
+            block = function.blocks[label]
+            live_out = set(exit_live) if block.terminator == 'halt' else set()
+            for target in block.targets:
+                live_out |= live_in[target]
+            new = use[label] | (live_out - define[label])
+            if new != live_in[label]:
+                live_in[label] = new
+                changed = True
+    return live_in
+
+def _live_out(function, block, live_in):
+    if block.terminator == 'halt':
+        return set(function.variables)
+    live = set()
+    for target in block.targets:
+        live |= live_in[target]
+    return live
+
+def _fold(instr, state):
+    """Substitute known constants into instr, fold it if possible, update state."""
+    instr.args = tuple(state[arg] if isinstance(arg, str) and isinstance(state.get(arg), int) else arg
+                       for arg in instr.args)
+    op = instr.op
+    if isinstance(op, Operator):
+        left, right = instr.args
+        if isinstance(left, int) and isinstance(right, int):
+            if not instr.can_raise():
+                instr.op, instr.args = 'copy', (evaluate_binop(op, left, right),)
+        elif op is Operator.MULT and 0 in (left, right):
+            instr.op, instr.args = 'copy', (0,)
+        elif (op is Operator.PLUS and left == 0) or (op is Operator.MULT and left == 1):
+            instr.op, instr.args = 'copy', (right,)
+        elif (op in (Operator.PLUS, Operator.MINUS) and right == 0) or (op in (Operator.MULT, Operator.DIV) and right == 1):
+            instr.op, instr.args = 'copy', (left,)
+    if instr.dest is not None:
+        if instr.op == 'copy' and isinstance(instr.args[0], int):
+            state[instr.dest] = instr.args[0]
+        elif instr.op == 'copy' and isinstance(state.get(instr.args[0]), int):
+            state[instr.dest] = state[instr.args[0]]
+        else:
+            state[instr.dest] = NAC
+
+def _meet(states):
+    merged = {}
+    for state in states:
+        for name, value in state.items():
+            if name not in merged:
+                merged[name] = value
+            elif merged[name] is not NAC and merged[name] != value:
+                merged[name] = NAC
+    return merged
+
+def constant_folding(function):
+    """Global constant propagation and folding; constant branches become jumps."""
+    preds = function.predecessors()
+    order = reverse_postorder(function)
+    out_states = {}
+    in_states = {}
+    changed = True
+    while changed:
+        changed = False
+        for label in order:
+            if label == function.entry:
+                state = dict.fromkeys(function.variables, 0)
+            else:
+                state = _meet(out_states[pred] for pred in preds[label] if pred in out_states)
+            in_states[label] = dict(state)
+            for instr in function.blocks[label].instrs:
+                _fold(Instr(instr.op, instr.dest, instr.args), state)
+            if out_states.get(label) != state:
+                out_states[label] = state
+                changed = True
+    for label in order:
+        block = function.blocks[label]
+        state = in_states[label]
+        for instr in block.instrs:
+            _fold(instr, state)
+        if block.terminator == 'branch':
+            cond = state.get(block.cond) if isinstance(block.cond, str) else block.cond
+            if isinstance(cond, int) and cond is not NAC:
+                block.jump(block.targets[0] if cond else block.targets[1])
+    remove_unreachable(function)
+
+def copy_propagation(function):
+    """Replace uses of x with y wherever the copy x = y reaches on every path."""
+    preds = function.predecessors()
+    order = reverse_postorder(function)
+    out_states = {}
+    in_states = {}
+
+    def transfer(instrs, copies, rewrite):
+        for instr in instrs:
+            if rewrite:
+                instr.args = tuple(copies.get(arg, arg) if isinstance(arg, str) else arg for arg in instr.args)
+            dest = instr.dest
+            if dest is None:
+                continue
+            for name in [name for name, source in copies.items() if name == dest or source == dest]:
+                del copies[name]
+            if instr.op == 'copy' and isinstance(instr.args[0], str) and instr.args[0] != dest:
+                copies[dest] = copies.get(instr.args[0], instr.args[0])
+        return copies
+
+    changed = True
+    while changed:
+        changed = False
+        for label in order:
+            incoming = [out_states[pred] for pred in preds[label] if pred in out_states]
+            if label == function.entry or not incoming:
+                copies = {}
+            else:
+                copies = {name: source for name, source in incoming[0].items()
+                          if all(state.get(name) == source for state in incoming[1:])}
+            in_states[label] = dict(copies)
+            copies = transfer(function.blocks[label].instrs, copies, rewrite=False)
+            if out_states.get(label) != copies:
+                out_states[label] = copies
+                changed = True
+    for label in order:
+        block = function.blocks[label]
+        copies = transfer(block.instrs, dict(in_states[label]), rewrite=True)
+        if isinstance(block.cond, str):
+            block.cond = copies.get(block.cond, block.cond)
+
+def common_subexpression_elimination(function):
+    """Local value numbering: reuse a binary operation already computed in the block."""
+    for block in function.blocks.values():
+        available = {}
+        for instr in block.instrs:
+            if isinstance(instr.op, Operator):
+                left, right = instr.args
+                if instr.op in COMMUTATIVE and str(left) > str(right):
+                    left, right = right, left
+                key = (instr.op, left, right)
+                holder = available.get(key)
+                if holder is not None:
+                    instr.op, instr.args = 'copy', (holder,)
+            else:
+                key = None
+            dest = instr.dest
+            if dest is None:
+                continue
+            for stale in [k for k, holder in available.items() if holder == dest or dest in k[1:]]:
+                del available[stale]
+            if key is not None and instr.op is key[0] and dest not in key[1:]:
+                available[key] = dest
+
+def dead_store_elimination(function):
+    """Delete copies and operations whose result is never read afterwards."""
+    changed = True
+    while changed:
+        changed = False
+        live_in = liveness(function)
+        for block in function.blocks.values():
+            live = _live_out(function, block, live_in)
+            if isinstance(block.cond, str):
+                live.add(block.cond)
+            kept = []
+            for instr in reversed(block.instrs):
+                removable = instr.op == 'copy' or (isinstance(instr.op, Operator) and not instr.can_raise())
+                if removable and instr.dest not in live:
+                    changed = True
+                    continue
+                if instr.dest is not None:
+                    live.discard(instr.dest)
+                live.update(instr.uses())
+                kept.append(instr)
+            kept.reverse()
+            block.instrs = kept
+
+def loop_invariant_code_motion(function):
+    """Hoist invariant computations out of repeat bodies into their preheaders.
+
+    A repeat body always runs at least once, so an instruction may move when
+    its block dominates every loop exit, its operands are not changed inside
+    the loop, it is the loop's only definition of its destination, and that
+    destination is not live on entry to the loop. Instructions that may
+    raise stay where they are.
+    """
+    # Innermost loops were lowered last; hoisting them first lets invariants
+    # bubble out through enclosing loops.
+    for loop in reversed(function.loops):
+        dom = dominators(function)
+        live_in = liveness(function)
+        blocks = sorted(loop.blocks & set(function.blocks))
+        exits = [label for label in blocks
+                 if any(target not in loop.blocks for target in function.blocks[label].targets)]
+        definitions = {}
+        for label in blocks:
+            for instr in function.blocks[label].instrs:
+                if instr.dest is not None:
+                    definitions[instr.dest] = definitions.get(instr.dest, 0) + 1
+        preheader = function.blocks[loop.preheader]
+        hoisted = set()
+        for label in blocks:
+            if not all(label in dom[exit_label] for exit_label in exits):
+                continue
+            block = function.blocks[label]
+            kept = []
+            for instr in block.instrs:
+                invariant = (
+                    (instr.op == 'copy' or isinstance(instr.op, Operator))
+                    and not instr.can_raise()
+                    and definitions.get(instr.dest) == 1
+                    and instr.dest not in live_in[loop.header]
+                    and all(arg in hoisted or arg not in definitions for arg in instr.uses())
+                )
+                if invariant:
+                    preheader.instrs.append(instr)
+                    hoisted.add(instr.dest)
+                else:
+                    kept.append(instr)
+            block.instrs = kept
+
+PASSES = {
+    "constant_folding": constant_folding,
+    "copy_propagation": copy_propagation,
+    "cse": common_subexpression_elimination,
+    "dead_store_elimination": dead_store_elimination,
+    "licm": loop_invariant_code_motion,
+}
+
+DEFAULT_PIPELINE = (
+    "constant_folding",
+    "copy_propagation",
+    "cse",
+    "copy_propagation",
+    "licm",
+    "constant_folding",
+    "dead_store_elimination",
+)
+
+PassResult = namedtuple("PassResult", ["name", "seconds", "before", "after"])
+
+class PassManager:
+    """Runs a configurable sequence of passes, timing each one."""
+
+    def __init__(self, pipeline=DEFAULT_PIPELINE):
+        self.pipeline = [(name, PASSES[name]) if isinstance(name, str) else (name.__name__, name)
+                         for name in pipeline]
+
+    def run(self, function):
+        results = []
+        for name, optimization in self.pipeline:
+            before = function.instruction_count()
+            start = time.perf_counter()
+            optimization(function)
+            results.append(PassResult(name, time.perf_counter() - start, before, function.instruction_count()))
+        return results
+
+def format_report(results):
+    lines = [f"{'pass':<24}{'time (ms)':>10}{'before':>9}{'after':>9}"]
+    for result in results:
+        lines.append(f"{result.name:<24}{result.seconds * 1000:>10.3f}{result.before:>9}{result.after:>9}")
+    return "\n".join(lines)
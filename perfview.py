@@ -0,0 +1,83 @@
+from collections import deque
+import tkinter as tk
+from tkinter import ttk
+import instrument
+
+MAX_EVENTS = 500
+POLL_MS = 200
+
+def _kilobytes(value):
+    return f"{value / 1024:.1f}" if value is not None else "-"
+
+class PerformancePanel(tk.Toplevel):
+    """A window listing the phases of each parse and render as they finish.
+
+    It is an instrument listener only while open, so the pipeline pays
+    nothing for it otherwise. Events arrive on the worker thread and are
+    queued; the window picks them up on a timer.
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Performance")
+        self.geometry("640x360")
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.totals = {}
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        header = ttk.Frame(self)
+        header.grid(row=0, column=0, columnspan=2, sticky="ew", padx=5, pady=5)
+        self.allocations_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(header, text="Track allocations (slower)", variable=self.allocations_var,
+                        command=lambda: instrument.track_allocations(self.allocations_var.get())).pack(side=tk.LEFT)
+        ttk.Button(header, text="Clear", command=self.clear).pack(side=tk.RIGHT)
+
+        self.table = ttk.Treeview(self, columns=("phase", "time", "allocated", "peak", "counts"), show="headings")
+        for column, text, width, anchor in (("phase", "Phase", 100, tk.W), ("time", "Time (ms)", 80, tk.E),
+                                            ("allocated", "Alloc (KB)", 80, tk.E), ("peak", "Peak (KB)", 80, tk.E),
+                                            ("counts", "Counts", 260, tk.W)):
+            self.table.heading(column, text=text)
+            self.table.column(column, width=width, anchor=anchor, stretch=column == "counts")
+        self.table.grid(row=1, column=0, sticky="nsew")
+        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.table.yview)
+        scrollbar.grid(row=1, column=1, sticky="ns")
+        self.table.config(yscrollcommand=scrollbar.set)
+        self.summary_label = ttk.Label(self, text="Parse some code to see where the time goes.")
+        self.summary_label.grid(row=2, column=0, columnspan=2, sticky="ew", padx=5, pady=5)
+
+        self.listener = self.events.append  # deque.append is safe to call from the worker thread
+        instrument.add_listener(self.listener)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.pending = self.after(POLL_MS, self._poll)
+
+    def clear(self):
+        self.events.clear()
+        self.totals = {}
+        self.table.delete(*self.table.get_children())
+        self.summary_label.config(text="")
+
+    def close(self):
+        instrument.remove_listener(self.listener)
+        if self.allocations_var.get():
+            instrument.track_allocations(False)
+        self.after_cancel(self.pending)
+        self.destroy()
+
+    def _poll(self):
+        added = False
+        while self.events:
+            event = self.events.popleft()
+            counts = ", ".join(f"{key}={value}" for key, value in event.counts.items())
+            item = self.table.insert("", tk.END, values=(event.name, f"{event.seconds * 1000:.2f}",
+                                                         _kilobytes(event.allocated), _kilobytes(event.peak), counts))
+            self.totals[event.name] = self.totals.get(event.name, 0.0) + event.seconds
+            added = True
+        if added:
+            rows = self.table.get_children()
+            if len(rows) > MAX_EVENTS:
+                self.table.delete(*rows[:len(rows) - MAX_EVENTS])
+            self.table.see(item)
+            self.summary_label.config(text="Totals: " + "  ".join(
+                f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.totals.items()))
+        self.pending = self.after(POLL_MS, self._poll)
@@ -1,4 +1,8 @@
+import os
 import re
+import mmap
+import codecs
+from array import array
 
 KEYWORDS = {
     'read': 'READ', 'write': 'WRITE',
@@ -23,44 +27,247 @@ token_specification = [
     ('MISMATCH', r'.')
 ]
 
+SYMBOL_CHARS = ';+-*/=<>()'
+
+CHUNK_SIZE = 1 << 16
+
+# Token types in kind-code order; TokenBuffer stores the index, not the string.
+TOKEN_TYPES = ('NUMBER', 'IDENTIFIER') + tuple(KEYWORDS.values()) + tuple(SYMBOLS.values())
+TOKEN_KINDS = {token_type: kind for kind, token_type in enumerate(TOKEN_TYPES)}
+
+# Character classes of the first character of a lexeme.
+CLASS_DIGIT, CLASS_LETTER, CLASS_OTHER = range(3)
+
+_CHAR_CLASS = [CLASS_OTHER] * 128
+for _ch in '0123456789':
+    _CHAR_CLASS[ord(_ch)] = CLASS_DIGIT
+for _ch in 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_':
+    _CHAR_CLASS[ord(_ch)] = CLASS_LETTER
+
+# Every lexeme the scanner can see: longest NUMBER or ID
+# run, ':=', or any single other non-space character. Whitespace is never part
+# of a lexeme, so SKIP/NEWLINE need no alternative of their own.
+_LEXEME = re.compile(r'\d+|[A-Za-z_][A-Za-z0-9_]*|:=|\S')
+_MISMATCH = re.compile(r'[^\s\dA-Za-z_:;+\-*/=<>()]|:(?!=)')
+
+class Scanner:
+    """Reusable TINY scanner; all tables are built once and shared across calls."""
+
+    def __init__(self):
+        # Fixed lexemes resolve with a single dict lookup. Symbols matched by
+        # token_specification but without a token type (e.g. '>') map to None
+        # and are dropped, exactly as tokenize always did.
+        self.fixed = {ch: None for ch in SYMBOL_CHARS}
+        self.fixed.update(SYMBOLS)
+        self.fixed.update(KEYWORDS)
+
+    def classify(self, value, code, first_line=1, first_column=1):
+        """Return the token type of a lexeme of code, or None for one that is dropped.
+
+        Raises the scanner's error (positioned in code) for a character
+        TINY does not allow. The loops below try fixed.get(value) first and
+        only call this for what that lookup does not settle.
+        """
+        if value in self.fixed:
+            return self.fixed[value]
+        code_point = ord(value[0])
+        if code_point < 128:
+            kind = _CHAR_CLASS[code_point]
+        else:
+            kind = CLASS_DIGIT if value[0].isdecimal() else CLASS_OTHER
+        if kind == CLASS_LETTER:
+            return 'IDENTIFIER'
+        if kind == CLASS_DIGIT:
+            return 'NUMBER'
+        self.error(code, first_line, first_column)
+
+    def tokenize(self, code, first_line=1, first_column=1):
+        tokens = []
+        append = tokens.append
+        fixed = self.fixed.get
+        classify = self.classify
+        for value in _LEXEME.findall(code):
+            token_type = fixed(value) or classify(value, code, first_line, first_column)
+            if token_type is not None:
+                append((value, token_type))
+        return tokens
+
+    def scan(self, code):
+        """Tokenize code into a TokenBuffer that keeps source positions."""
+        buffer = TokenBuffer(code)
+        kinds, starts, ends, lines = buffer.kinds, buffer.starts, buffer.ends, buffer.lines
+        fixed = self.fixed.get
+        classify = self.classify
+        token_kinds = TOKEN_KINDS
+        count_newlines = code.count
+        line = 1
+        previous_end = 0
+        for mo in _LEXEME.finditer(code):
+            value = mo.group()
+            token_type = fixed(value) or classify(value, code)
+            if token_type is None:
+                continue
+            start, end = mo.span()
+            line += count_newlines('\n', previous_end, start)
+            previous_end = end
+            kinds.append(token_kinds[token_type])
+            starts.append(start)
+            ends.append(end)
+            lines.append(line)
+        return buffer
+
+    def iter_tokens(self, source, chunk_size=CHUNK_SIZE, encoding="utf-8"):
+        """Lazily yield the tokens of a path, file object or mmap, chunk by chunk."""
+        # Each buffer is scanned up to the end of its last complete lexeme:
+        # only a trailing run of letters, digits and '_', or a ':' that may
+        # start ':=', can go on in the next chunk, so just that is carried
+        # over. Memory stays bounded by the chunk size however long the lines.
+        pending = []
+        line = column = 1
+        for chunk in _read_chunks(source, chunk_size, encoding):
+            cut = len(chunk)
+            if chunk.endswith(':'):
+                cut -= 1
+            else:
+                while cut and (chunk[cut - 1].isalnum() or chunk[cut - 1] == '_'):
+                    cut -= 1
+            if not cut:
+                pending.append(chunk)
+                continue
+            pending.append(chunk[:cut])
+            text = ''.join(pending)
+            yield from self.tokenize(text, line, column)
+            newlines = text.count('\n')
+            if newlines:
+                line += newlines
+                column = len(text) - text.rfind('\n')
+            else:
+                column += len(text)
+            pending = [chunk[cut:]]
+        if pending:
+            yield from self.tokenize(''.join(pending), line, column)
+
+    def error(self, code, first_line=1, first_column=1):
+        mo = _MISMATCH.search(code)
+        value = mo.group()[0] if mo else ''
+        char_code = f"(ASCII: {ord(value)})" if len(value) == 1 else ""
+        location = ""
+        if mo:
+            line, column = line_column(code, mo.start())
+            if line == 1:
+                column += first_column - 1
+            location = f" at line {line + first_line - 1}:{column}"
+        raise RuntimeError(f'Unexpected character: "{value}" {char_code}{location}')
+
+class TokenBuffer:
+    """Struct-of-arrays token storage; values are sliced from the source on demand.
+
+    Indexing yields the same (value, type) tuples tokenize returns, so a
+    TokenBuffer can be handed to parser.TokenStream unchanged.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.lines = array('I')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return (self.source[self.starts[index]:self.ends[index]], TOKEN_TYPES[self.kinds[index]])
+
+    def __iter__(self):
+        source = self.source
+        for kind, start, end in zip(self.kinds, self.starts, self.ends):
+            yield (source[start:end], TOKEN_TYPES[kind])
+
+    def value(self, index):
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def type(self, index):
+        return TOKEN_TYPES[self.kinds[index]]
+
+    def position(self, index):
+        """Return the 1-based (line, column) at which token index starts."""
+        start = self.starts[index]
+        return self.lines[index], start - self.source.rfind('\n', 0, start)
+
+def line_column(code, offset):
+    """Return the 1-based (line, column) of a character offset in code."""
+    return code.count('\n', 0, offset) + 1, offset - code.rfind('\n', 0, offset)
+
+def _read_chunks(source, chunk_size, encoding):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", encoding=encoding) as file:
+            yield from _read_chunks(file, chunk_size, encoding)
+        return
+    if isinstance(source, mmap.mmap):
+        # Slice instead of read() so the caller's mmap position is left alone.
+        blocks = (source[offset:offset + chunk_size] for offset in range(0, len(source), chunk_size))
+    else:
+        blocks = iter(lambda: source.read(chunk_size), source.read(0))
+    decoder = None
+    for block in blocks:
+        if isinstance(block, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)()
+            block = decoder.decode(block)
+        if block:
+            yield block
+    if decoder is not None:
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+_default_scanner = Scanner()
+
 def tokenize(code):
-    tokens = []
-    tok_regex = '|'.join(f'(?P<{name}>{pattern})' for name, pattern in token_specification)
-    for mo in re.finditer(tok_regex, code):
-        kind = mo.lastgroup
-        value = mo.group()
-
-        if kind == 'NUMBER':
-            tokens.append((value, 'NUMBER'))
-        elif kind == 'ID':
-            token_type = KEYWORDS.get(value, 'IDENTIFIER')
-            tokens.append((value, token_type))
-        elif kind == 'ASSIGN':
-            tokens.append((value, SYMBOLS[':=']))
-        elif kind == 'SYMBOL':
-            token_type = SYMBOLS.get(value)
-            if token_type:
-                tokens.append((value, token_type))
-        elif kind in ('SKIP', 'NEWLINE'):
-            continue        
-        elif kind == 'MISMATCH':
-            char_code = f"(ASCII: {ord(value)})" if len(value) == 1 else ""
-            raise RuntimeError(f'Unexpected character: "{value}" {char_code}')
-    return tokens
-
-def main():
+    return _default_scanner.tokenize(code)
+
+def scan(code):
+    return _default_scanner.scan(code)
+
+def iter_tokens(source, chunk_size=CHUNK_SIZE, encoding="utf-8"):
+    return _default_scanner.iter_tokens(source, chunk_size, encoding)
+
+def main(argv=None):
+    # Imported here, so that importing scanner pulls in nothing else.
+    import argparse
+    import instrument
+    arg_parser = argparse.ArgumentParser(description="Scan sample_code.txt into tokens.txt.")
+    arg_parser.add_argument("--profile", action="store_true", help="time the scan and print a breakdown")
+    options = arg_parser.parse_args(argv)
+    recorder = instrument.Recorder() if options.profile else None
+    if recorder:
+        instrument.add_listener(recorder)
+    # Tokens go to a temporary file that replaces tokens.txt only once the
+    # whole scan succeeded, so an error never leaves a truncated tokens.txt.
+    temporary = f"tokens.txt.{os.getpid()}.tmp"
     try:
-        with open("sample_code.txt", "r") as file:
-            code = file.read()
-        tokens = tokenize(code)
-        with open("tokens.txt", "w") as out:
-            for value, token_type in tokens:
-                out.write(f"{value},{token_type}\n")
+        with open("sample_code.txt", "r") as file, open(temporary, "w") as out:
+            with instrument.phase("tokenize") as record:
+                count = 0
+                for value, token_type in iter_tokens(file):
+                    out.write(f"{value},{token_type}\n")
+                    count += 1
+                record.count(tokens=count)
+        os.replace(temporary, "tokens.txt")
         print("Scanning complete. Tokens written to tokens.txt.")
     except FileNotFoundError:
         print("Error: sample_code.txt not found.")
     except Exception as e:
         print(f"Error: {e}")
-        
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        if recorder:
+            instrument.remove_listener(recorder)
+            print(instrument.format_totals(recorder.totals()))
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,201 @@
+from collections import OrderedDict
+import tkinter as tk
+import instrument
+
+TILE_SIZE = 256
+MIN_LEVEL_SIZE = 256
+TILE_CACHE_SIZE = 512
+DEBOUNCE_MS = 40
+CLICK_SLOP = 3  # pixels the pointer may move between press and release for a click
+
+class TilePyramid:
+    """A tree image at successively halved resolutions, cut into tiles on demand.
+
+    levels[0] is the full-resolution image; each further level is half the
+    size of the one before, down to one that fits in MIN_LEVEL_SIZE. It only
+    uses PIL, so it can be built on a worker thread, and it is built once
+    and then reused for every zoom and pan.
+    """
+
+    def __init__(self, image):
+        levels = [image]
+        while max(levels[-1].size) > MIN_LEVEL_SIZE:
+            levels.append(levels[-1].reduce(2))
+        self.levels = levels
+
+    def size(self, level):
+        return self.levels[level].size
+
+    def tile(self, level, column, row):
+        image = self.levels[level]
+        left, top = column * TILE_SIZE, row * TILE_SIZE
+        return image.crop((left, top, min(left + TILE_SIZE, image.width), min(top + TILE_SIZE, image.height)))
+
+    def fit_level(self, width, height):
+        """Return the most detailed level that fits in width x height (or the smallest level)."""
+        for level, image in enumerate(self.levels):
+            if image.width <= width and image.height <= height:
+                return level
+        return len(self.levels) - 1
+
+class TileViewer:
+    """Shows a TilePyramid on a Tk canvas with zoom and pan.
+
+    Only the tiles that intersect the visible area exist as canvas items;
+    their PhotoImages are kept in an LRU cache, so panning back over a region
+    or returning to a zoom level does not re-create them. Redraws requested
+    by resize, zoom and pan events are debounced into one. A click (a press
+    and release without dragging) calls on_click(x, y) with the point in
+    full-resolution image pixels.
+    """
+
+    def __init__(self, canvas, on_click=None):
+        self.canvas = canvas
+        self.on_click = on_click
+        self.press = None
+        self.pyramid = None
+        self.level = 0
+        self.origin = (0, 0)
+        self.items = {}
+        self.photos = OrderedDict()
+        self.pending = None
+        canvas.bind("<ButtonPress-1>", self._start_pan)
+        canvas.bind("<B1-Motion>", self._pan)
+        canvas.bind("<ButtonRelease-1>", self._release)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            canvas.bind(sequence, self._on_wheel)
+
+    def set_pyramid(self, pyramid, keep_view=False):
+        """Show pyramid; with keep_view, stay at the current zoom level and scroll position."""
+        left, top, level = self.canvas.canvasx(0), self.canvas.canvasy(0), self.level
+        self.clear()
+        self.pyramid = pyramid
+        if not keep_view:
+            self.fit()
+            return
+        self._set_level(min(level, len(pyramid.levels) - 1))
+        width, height = self._layout()
+        self.canvas.xview_moveto(left / max(width, self.canvas.winfo_width()))
+        self.canvas.yview_moveto(top / max(height, self.canvas.winfo_height()))
+        self.update()
+
+    def clear(self):
+        if self.pending:
+            self.canvas.after_cancel(self.pending)
+            self.pending = None
+        self.canvas.delete("tile")
+        self.items = {}
+        self.photos.clear()
+        self.pyramid = None
+
+    def schedule_update(self, delay=DEBOUNCE_MS):
+        if self.pending:
+            self.canvas.after_cancel(self.pending)
+        self.pending = self.canvas.after(delay, self.update)
+
+    def fit(self):
+        if not self.pyramid:
+            return
+        self._set_level(self.pyramid.fit_level(self.canvas.winfo_width(), self.canvas.winfo_height()))
+        self.canvas.xview_moveto(0)
+        self.canvas.yview_moveto(0)
+        self.update()
+
+    def zoom(self, steps, x=None, y=None):
+        """Zoom in (steps > 0) or out by whole pyramid levels, keeping the point at window x, y still."""
+        if not self.pyramid:
+            return
+        level = max(0, min(len(self.pyramid.levels) - 1, self.level - steps))
+        if level == self.level:
+            return
+        if x is None:
+            x, y = self.canvas.winfo_width() // 2, self.canvas.winfo_height() // 2
+        old_width, old_height = self.pyramid.size(self.level)
+        fraction_x = (self.canvas.canvasx(x) - self.origin[0]) / old_width
+        fraction_y = (self.canvas.canvasy(y) - self.origin[1]) / old_height
+        self._set_level(level)
+        width, height = self._layout()
+        region_width, region_height = max(width, self.canvas.winfo_width()), max(height, self.canvas.winfo_height())
+        self.canvas.xview_moveto((self.origin[0] + fraction_x * width - x) / region_width)
+        self.canvas.yview_moveto((self.origin[1] + fraction_y * height - y) / region_height)
+        self.schedule_update()
+
+    def _set_level(self, level):
+        self.level = level
+        self.canvas.delete("tile")
+        self.items = {}
+        self._layout()
+
+    def _layout(self):
+        """Centre the current level in the canvas and size the scroll region to it."""
+        width, height = self.pyramid.size(self.level)
+        canvas_width, canvas_height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        origin = (max(0, (canvas_width - width) // 2), max(0, (canvas_height - height) // 2))
+        if origin != self.origin:
+            self.canvas.delete("tile")
+            self.items = {}
+            self.origin = origin
+        self.canvas.config(scrollregion=(0, 0, max(width, canvas_width), max(height, canvas_height)))
+        return width, height
+
+    def update(self):
+        """Draw the tiles that intersect the visible area and drop the rest."""
+        self.pending = None
+        if not self.pyramid:
+            return
+        width, height = self._layout()
+        left = self.canvas.canvasx(0) - self.origin[0]
+        top = self.canvas.canvasy(0) - self.origin[1]
+        right = left + self.canvas.winfo_width()
+        bottom = top + self.canvas.winfo_height()
+        columns = range(max(0, int(left) // TILE_SIZE), min(-(-width // TILE_SIZE), int(right) // TILE_SIZE + 1))
+        rows = range(max(0, int(top) // TILE_SIZE), min(-(-height // TILE_SIZE), int(bottom) // TILE_SIZE + 1))
+        visible = {(column, row) for column in columns for row in rows}
+        with instrument.phase("draw_tiles") as record:
+            for key in [key for key in self.items if key not in visible]:
+                self.canvas.delete(self.items.pop(key))
+            # Touch the tiles already on screen first, so creating new ones can only evict off-screen tiles.
+            for column, row in visible & self.items.keys():
+                self.photos.move_to_end((self.level, column, row))
+            new = visible - self.items.keys()
+            for column, row in new:
+                self.items[column, row] = self.canvas.create_image(
+                    self.origin[0] + column * TILE_SIZE, self.origin[1] + row * TILE_SIZE,
+                    anchor=tk.NW, image=self._photo(self.level, column, row), tags="tile")
+            record.count(level=self.level, visible=len(visible), new=len(new))
+
+    def _photo(self, level, column, row):
+        key = (level, column, row)
+        photo = self.photos.get(key)
+        if photo is None:
+            from PIL import ImageTk
+            photo = self.photos[key] = ImageTk.PhotoImage(self.pyramid.tile(level, column, row))
+            while len(self.photos) > TILE_CACHE_SIZE:
+                self.photos.popitem(last=False)
+        else:
+            self.photos.move_to_end(key)
+        return photo
+
+    def image_point(self, x, y):
+        """Map window coordinates to full-resolution image pixels."""
+        width, height = self.pyramid.size(self.level)
+        full_width, full_height = self.pyramid.size(0)
+        return ((self.canvas.canvasx(x) - self.origin[0]) * full_width / width,
+                (self.canvas.canvasy(y) - self.origin[1]) * full_height / height)
+
+    def _start_pan(self, event):
+        self.press = (event.x, event.y)
+        self.canvas.scan_mark(event.x, event.y)
+
+    def _release(self, event):
+        press, self.press = self.press, None
+        if (self.on_click and self.pyramid and press
+                and abs(event.x - press[0]) <= CLICK_SLOP and abs(event.y - press[1]) <= CLICK_SLOP):
+            self.on_click(*self.image_point(event.x, event.y))
+
+    def _pan(self, event):
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self.schedule_update()
+
+    def _on_wheel(self, event):
+        self.zoom(1 if event.num == 4 or event.delta > 0 else -1, event.x, event.y)
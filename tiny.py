@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import signal
+import fnmatch
+import functools
+import threading
+import contextlib
+from scanner import tokenize, scan
+from parser import TokenStream, parse_program_iterative, parse_program_recovering
+import transpiler
+import vm
+import instrument
+
+SOURCE_PATTERNS = ("*.tiny", "*.tny", "*.txt")
+MAX_CHUNK_SIZE = 64
+RUN_TIMEOUT = 10.0  # seconds a program may run under --run before it is stopped
+
+def _compile_tree(root):
+    try:
+        return transpiler.to_code(root)
+    except (RecursionError, SyntaxError):
+        # Nesting too deep for CPython's compiler (e.g. more than 20 nested
+        # repeat loops); the bytecode VM has no such limit.
+        return vm.compile_program(root)
+
+@functools.lru_cache(maxsize=256)
+def _compile(source):
+    return _compile_tree(parse_program_iterative(TokenStream(tokenize(source))))
+
+def _load(code):
+    if isinstance(code, vm.Bytecode):
+        return functools.partial(vm.execute, code)
+    return transpiler.load_function(code)
+
+def compile_to_callable(source):
+    """Compile TINY source to a function f(inputs=(), output=print).
+
+    read pulls values from inputs, write passes each value to output, and
+    the function returns the final variables as a dict. The compiled code
+    object is cached by source text, so recompiling the same program is free.
+    """
+    return _load(_compile(source))
+
+def compile_tree(root):
+    """Like compile_to_callable, for a tree that is already parsed; nothing is cached."""
+    return _load(_compile_tree(root))
+
+def find_sources(paths, patterns=SOURCE_PATTERNS):
+    """Yield the files named in paths; directories are searched recursively for names matching patterns."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, subdirectories, names in os.walk(path):
+            subdirectories.sort()
+            for name in sorted(names):
+                if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                    yield os.path.join(directory, name)
+
+def _count_nodes(root):
+    count, stack = 0, [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+@contextlib.contextmanager
+def _time_limit(seconds):
+    """Raise TimeoutError inside the block once it has run for seconds.
+
+    Uses a SIGALRM interval timer, so it interrupts plain Python loops
+    (transpiled code and the VM alike) without slowing them down. Where
+    there is no SIGALRM (Windows), or off the main thread, or with seconds
+    falsy, there is no limit.
+    """
+    if not seconds or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expire(signum, frame):
+        raise TimeoutError(f"program still running after {seconds:g}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def build_file(path, options):
+    """Scan and parse one file, then render and/or run it if options ask to.
+
+    Returns a JSON-ready dict; any error is reported in it rather than
+    raised, so one bad file does not stop a batch. A file that does not
+    parse also gets "errors", the list of all its syntax errors. A program
+    run with options.run is stopped after options.timeout seconds, which
+    is reported as its error like any other.
+    """
+    started = time.perf_counter()
+    result = {"file": path}
+    recorder = instrument.Recorder() if getattr(options, "profile", False) else None
+    if recorder:
+        instrument.add_listener(recorder)
+    try:
+        with instrument.phase("read"):
+            with open(path, encoding="utf-8") as file:
+                source = file.read()
+        with instrument.phase("tokenize") as record:
+            tokens = scan(source)
+            record.count(tokens=len(tokens))
+        with instrument.phase("parse") as record:
+            try:
+                root = parse_program_iterative(TokenStream(tokens))
+            except SyntaxError:
+                # Only failing files pay for the second, recovering parse that finds every error.
+                _, errors = parse_program_recovering(tokens)
+                result["errors"] = [str(error) for error in errors]
+                raise
+            nodes = _count_nodes(root)
+            record.count(nodes=nodes)
+        result["tokens"] = len(tokens)
+        result["nodes"] = nodes
+        if options.render:
+            with instrument.phase("render"):
+                from visualizer import TreeVisualizer  # needs graphviz, so only when rendering
+                tree = TreeVisualizer(backend=options.backend).render_tree(root)
+                if tree is None:
+                    raise RuntimeError("could not build the tree drawing")
+                name = os.path.splitext(os.path.basename(path))[0]
+                result["render"] = tree.render(os.path.join(options.output_dir or os.path.dirname(path), name),
+                                               format=options.render, cleanup=True)
+        if options.run:
+            with instrument.phase("run"):
+                output = []
+                program = compile_tree(root)
+                with _time_limit(getattr(options, "timeout", RUN_TIMEOUT)):
+                    program(inputs=options.inputs, output=output.append)
+            result["output"] = output
+        result["ok"] = True
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if recorder:
+            instrument.remove_listener(recorder)
+    if recorder:
+        # Workers are separate processes, so their timings travel back in the result.
+        result["phases"] = {name: round(seconds, 6) for name, seconds in recorder.totals().items()}
+    result["seconds"] = round(time.perf_counter() - started, 6)
+    return result
+
+def build_chunk(paths, options):
+    return [build_file(path, options) for path in paths]
+
+def build(paths, options, jobs=None, chunk_size=None):
+    """Build every file in paths across jobs processes; yield results as chunks finish.
+
+    Files are sent to the workers in chunks (by default sized so each
+    worker gets about four) to keep the per-task overhead small. With
+    jobs=1 everything runs in this process.
+    """
+    paths = list(paths)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        for path in paths:
+            yield build_file(path, options)
+        return
+    from concurrent.futures import ProcessPoolExecutor, as_completed  # pulls in multiprocessing
+    chunk_size = chunk_size or max(1, min(MAX_CHUNK_SIZE, len(paths) // (jobs * 4)))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(build_chunk, paths[start:start + chunk_size], options)
+                   for start in range(0, len(paths), chunk_size)]
+        for future in as_completed(futures):
+            yield from future.result()
+
+def main(argv=None):
+    import argparse
+    arg_parser = argparse.ArgumentParser(prog="python -m tiny", description="Command-line tools for TINY programs.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="scan and parse TINY files in parallel, printing one JSON line per file")
+    build_parser.add_argument("paths", nargs="+", help="source files, or directories to search")
+    build_parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: one per core)")
+    build_parser.add_argument("--chunk-size", type=int, help="files per task sent to a worker")
+    build_parser.add_argument("--pattern", action="append",
+                              help=f"file name pattern to search directories for (default: {' '.join(SOURCE_PATTERNS)})")
+    build_parser.add_argument("--render", choices=("png", "pdf", "svg"), help="also draw each parse tree in this format")
+    build_parser.add_argument("--backend", choices=("graphviz", "tidy"), default="graphviz", help="tree layout engine for --render")
+    build_parser.add_argument("--output-dir", help="where to write drawings (default: next to each source file)")
+    build_parser.add_argument("--run", action="store_true", help="also execute each program and record what it writes")
+    build_parser.add_argument("--inputs", type=int, nargs="*", default=[], help="values for read statements when running")
+    build_parser.add_argument("--timeout", type=float, default=RUN_TIMEOUT,
+                              help=f"seconds each program may run before it is stopped, 0 for no limit (default: {RUN_TIMEOUT:g})")
+    build_parser.add_argument("--profile", action="store_true",
+                              help="time each phase per file and print a breakdown at the end")
+    options = arg_parser.parse_args(argv)
+
+    started = time.perf_counter()
+    count = failed = errors = 0
+    phases = {}
+    for result in build(find_sources(options.paths, options.pattern or SOURCE_PATTERNS), options,
+                        options.jobs, options.chunk_size):
+        print(json.dumps(result))
+        count += 1
+        failed += not result["ok"]
+        errors += len(result.get("errors", ()))
+        for name, seconds in result.get("phases", {}).items():
+            phases[name] = phases.get(name, 0.0) + seconds
+    print(f"Built {count} files in {time.perf_counter() - started:.2f}s: {count - failed} ok, {failed} failed"
+          + (f" ({errors} syntax errors)." if errors else "."), file=sys.stderr)
+    if options.profile:
+        print(instrument.format_totals(phases), file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
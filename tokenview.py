@@ -0,0 +1,110 @@
+import tkinter as tk
+from tkinter import ttk
+from scanner import TOKEN_TYPES
+
+ALL_TYPES = "All types"
+DEFAULT_ROW_HEIGHT = 20
+WHEEL_ROWS = 3
+
+class TokenTable(ttk.Frame):
+    """A virtualised token list with a filter by token type.
+
+    However many tokens there are, the Treeview only ever holds one item per
+    visible row; scrolling rewrites those items' values from the token list,
+    so showing 100k tokens costs the same as showing 30.
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.tokens = []
+        self.rows = range(0)
+        self.offset = 0
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        header = ttk.Frame(self)
+        header.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        self.label = ttk.Label(header, text="Tokens:")
+        self.label.pack(side=tk.LEFT)
+        self.count_label = ttk.Label(header, text="")
+        self.count_label.pack(side=tk.LEFT, padx=(5, 0))
+        self.filter_var = tk.StringVar(value=ALL_TYPES)
+        self.filter_box = ttk.Combobox(header, textvariable=self.filter_var, state="readonly", width=14,
+                                       values=(ALL_TYPES,) + TOKEN_TYPES)
+        self.filter_box.pack(side=tk.RIGHT)
+        self.filter_box.bind("<<ComboboxSelected>>", lambda event: self._apply_filter())
+
+        self.tree = ttk.Treeview(self, columns=("index", "value", "type"), show="headings", selectmode="browse")
+        self.tree.heading("index", text="#")
+        self.tree.heading("value", text="Value")
+        self.tree.heading("type", text="Type")
+        self.tree.column("index", width=60, stretch=False, anchor=tk.E)
+        self.tree.column("value", width=120)
+        self.tree.column("type", width=120)
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+
+        self.tree.bind("<Configure>", lambda event: self._refresh())
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self._on_wheel)
+
+    def set_tokens(self, tokens):
+        """Show tokens, any indexable sequence of (value, type) pairs."""
+        self.tokens = tokens if tokens is not None else []
+        self._apply_filter()
+
+    def clear(self):
+        self.set_tokens([])
+
+    def _apply_filter(self):
+        token_type = self.filter_var.get()
+        if token_type == ALL_TYPES:
+            self.rows = range(len(self.tokens))
+        else:
+            self.rows = [index for index, (_, kind) in enumerate(self.tokens) if kind == token_type]
+        self.offset = 0
+        shown = len(self.rows)
+        self.count_label.config(text=f"{shown} of {len(self.tokens)}" if shown != len(self.tokens) else str(shown))
+        self._refresh()
+
+    def _visible_rows(self):
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or DEFAULT_ROW_HEIGHT)
+        heading_height = row_height + 4
+        return max(1, (self.tree.winfo_height() - heading_height) // row_height)
+
+    def _refresh(self):
+        visible = self._visible_rows()
+        self.offset = max(0, min(self.offset, len(self.rows) - visible))
+        items = self.tree.get_children()
+        wanted = min(visible, len(self.rows) - self.offset)
+        if len(items) > wanted:
+            self.tree.delete(*items[wanted:])
+            items = items[:wanted]
+        for _ in range(len(items), wanted):
+            items += (self.tree.insert("", tk.END),)
+        for position, item in enumerate(items):
+            index = self.rows[self.offset + position]
+            value, token_type = self.tokens[index]
+            self.tree.item(item, values=(index + 1, value, token_type))
+        total = len(self.rows)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, amount, what):
+        step = self._visible_rows() if what == "pages" else 1
+        self.offset += int(amount) * step
+        self._refresh()
+
+    def _on_wheel(self, event):
+        self.scroll(-WHEEL_ROWS if event.num == 4 or event.delta > 0 else WHEEL_ROWS, "units")
+        return "break"  # keep the Treeview's own scrolling from moving the row items
+
+    def _on_scrollbar(self, command, *args):
+        if command == "moveto":
+            self.offset = int(float(args[0]) * len(self.rows))
+            self._refresh()
+        elif command == "scroll":
+            self.scroll(args[0], args[1])
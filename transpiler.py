@@ -0,0 +1,102 @@
+import ast
+from nodes import Operator, Program, StmtSeq, If, Repeat, Assign, Read, Write, BinOp, Const, Id
+from vm import divide, read_value
+
+FUNCTION_NAME = "tiny_program"
+
+ARITHMETIC = {Operator.PLUS: ast.Add, Operator.MINUS: ast.Sub, Operator.MULT: ast.Mult}
+COMPARISON = {Operator.LESSTHAN: ast.Lt, Operator.EQUAL: ast.Eq}
+
+# Names the generated function relies on; TINY variables are prefixed with
+# "v_" so they can never collide with these or with Python keywords.
+RUNTIME = {"_divide": divide, "_read": read_value}
+
+def _variable(name, ctx):
+    return ast.Name(id=f"v_{name}", ctx=ctx())
+
+def _collect_names(root):
+    names = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (Assign, Read, Id)):
+            names.setdefault(node.name, None)
+        stack.extend(node.children)
+    return list(names)
+
+def _expression(node):
+    if isinstance(node, Const):
+        return ast.Constant(node.value)
+    if isinstance(node, Id):
+        return _variable(node.name, ast.Load)
+    if node.op in COMPARISON:
+        # Comparisons are 1/0 valued, like the VM.
+        return ast.IfExp(test=_condition(node), body=ast.Constant(1), orelse=ast.Constant(0))
+    left, right = _expression(node.left), _expression(node.right)
+    if node.op is Operator.DIV:
+        return ast.Call(func=ast.Name(id="_divide", ctx=ast.Load()), args=[left, right], keywords=[])
+    return ast.BinOp(left=left, op=ARITHMETIC[node.op](), right=right)
+
+def _condition(node):
+    """Lower an expression used as a truth value; comparisons stay native."""
+    if isinstance(node, BinOp) and node.op in COMPARISON:
+        return ast.Compare(left=_expression(node.left), ops=[COMPARISON[node.op]()],
+                           comparators=[_expression(node.right)])
+    return _expression(node)
+
+def _statements(node):
+    if isinstance(node, Program):
+        return _statements(node.body)
+    if isinstance(node, StmtSeq):
+        body = []
+        for statement in node.statements:
+            body.extend(_statements(statement))
+        return body
+    if isinstance(node, Assign):
+        return [ast.Assign(targets=[_variable(node.name, ast.Store)], value=_expression(node.expr))]
+    if isinstance(node, Read):
+        call = ast.Call(func=ast.Name(id="_read", ctx=ast.Load()), args=[ast.Name(id="inputs", ctx=ast.Load())], keywords=[])
+        return [ast.Assign(targets=[_variable(node.name, ast.Store)], value=call)]
+    if isinstance(node, Write):
+        call = ast.Call(func=ast.Name(id="output", ctx=ast.Load()), args=[_expression(node.expr)], keywords=[])
+        return [ast.Expr(call)]
+    if isinstance(node, If):
+        orelse = _statements(node.else_branch) if node.else_branch is not None else []
+        return [ast.If(test=_condition(node.cond), body=_statements(node.then_branch), orelse=orelse)]
+    if isinstance(node, Repeat):
+        # repeat ... until c  ->  while True: ...; if c: break
+        body = _statements(node.body)
+        body.append(ast.If(test=_condition(node.cond), body=[ast.Break()], orelse=[]))
+        return [ast.While(test=ast.Constant(True), body=body, orelse=[])]
+    raise TypeError(f"Cannot lower node {node!r}")
+
+def to_python_ast(root):
+    """Lower a parse_program tree to a module defining tiny_program(inputs=(), output=print).
+
+    TINY variables become locals of the function, initialised to 0. The
+    function returns the final variables as a {name: value} dict.
+    """
+    names = _collect_names(root)
+    body = [ast.Assign(targets=[ast.Name(id="inputs", ctx=ast.Store())],
+                       value=ast.Call(func=ast.Name(id="iter", ctx=ast.Load()),
+                                      args=[ast.Name(id="inputs", ctx=ast.Load())], keywords=[]))]
+    for name in names:
+        body.append(ast.Assign(targets=[_variable(name, ast.Store)], value=ast.Constant(0)))
+    body.extend(_statements(root))
+    body.append(ast.Return(ast.Dict(keys=[ast.Constant(name) for name in names],
+                                    values=[_variable(name, ast.Load) for name in names])))
+    module = ast.parse(f"def {FUNCTION_NAME}(inputs=(), output=print): pass")
+    module.body[0].body = body
+    return ast.fix_missing_locations(module)
+
+def to_python_source(root):
+    return ast.unparse(to_python_ast(root))
+
+def to_code(root, filename="<tiny>"):
+    """Compile a parse_program tree to a Python code object defining tiny_program."""
+    return compile(to_python_ast(root), filename, "exec")
+
+def load_function(code):
+    namespace = dict(RUNTIME)
+    exec(code, namespace)
+    return namespace[FUNCTION_NAME]
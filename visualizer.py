@@ -1,55 +1,214 @@
-from graphviz import Digraph
-from parser import SyntaxTreeNode
+import io
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from nodes import Node
+from layout import layout_tree
+
+# (shape, fillcolor) per typed node kind.
+NODE_STYLES = {
+    'program': ("ellipse", "plum1"),
+    'stmt_seq': ("ellipse", "plum1"),
+    'if': ("ellipse", "plum1"),
+    'repeat': ("ellipse", "plum1"),
+    'write': ("ellipse", "plum1"),
+    'assign': ("ellipse", "skyblue"),
+    'read': ("ellipse", "skyblue"),
+    'const': ("ellipse", "skyblue"),
+    'id': ("ellipse", "skyblue"),
+    'OP': ("box", "lightgoldenrod1"),
+    'summary': ("box", "lightgray"),
+    'error': ("box", "tomato"),
+}
+
+# "graphviz" writes DOT source for the dot subprocess to lay out; "tidy" lays
+# the tree out in-process (see layout.py) and returns a TreeLayout.
+BACKENDS = ("graphviz", "tidy")
+
+def _source(text, engine='dot'):
+    # graphviz is only imported once something is actually drawn with it.
+    from graphviz import Source
+    return Source(text, engine=engine)
+
+WRITE_BATCH = 4096  # DOT lines buffered between writes
+RENDER_CACHE_BYTES = 128 << 20
+EXPORT_FORMATS = ("png", "pdf", "svg")
 
 class TreeVisualizer:
-    def __init__(self, rankdir='LR', comment="TINY Syntax Tree"):
+    def __init__(self, rankdir='LR', comment="TINY Syntax Tree", backend="graphviz"):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown tree backend: {backend}")
         self.rankdir = rankdir
         self.comment = comment
-        self.node_counter = 0 
-
-    def _get_node_id(self):
-        node_id = f"node{self.node_counter}"
-        self.node_counter += 1
-        return node_id
-
-    def _add_nodes_edges(self, dot, node, parent_id=None):
-        current_id = self._get_node_id()
-
-        is_keyword_like = not node.label.islower() and not node.label.startswith('assign (') and not node.label.startswith('read (') and not node.label.startswith('const (') and not node.label.startswith('id (') and not node.label.startswith('OP (')
-        
-        if node.label in ['program', 'stmt_seq', 'if', 'repeat', 'assign', 'read', 'write', 'OP']:
-             shape = "ellipse"
-             color = "plum1" 
-        elif node.label.islower() and node.label not in ['if', 'then', 'else', 'end', 'repeat', 'until', 'read', 'write']: 
-            shape = "ellipse"
-            color = "skyblue"
-        elif any(k_word in node.label for k_word in ['assign (', 'read (', 'const (', 'id (', 'OP (']): 
-            shape = "box"
-            color = "lightgoldenrod1" 
-        else: 
-            shape = "box"
-            color = "palegreen" 
-
-        dot.node(current_id, label=str(node.label), shape=shape, style="filled", fillcolor=color)
-
-        if parent_id is not None:
-            dot.edge(parent_id, current_id)
-
-        for child in node.children:
-            self._add_nodes_edges(dot, child, current_id)
-
-    def render_tree(self, root: SyntaxTreeNode):
-        if not isinstance(root, SyntaxTreeNode):
+        self.backend = backend
+        self.label_styles = {}  # label -> style, for generic nodes
+
+    def _label_style(self, label):
+        if label in ['program', 'stmt_seq', 'if', 'repeat', 'assign', 'read', 'write', 'OP']:
+            return "ellipse", "plum1"
+        elif label.islower() and label not in ['if', 'then', 'else', 'end', 'repeat', 'until', 'read', 'write']:
+            return "ellipse", "skyblue"
+        elif any(k_word in label for k_word in ['assign (', 'read (', 'const (', 'id (', 'OP (']):
+            return "box", "lightgoldenrod1"
+        else:
+            return "box", "palegreen"
+
+    def _node_style(self, node):
+        style = NODE_STYLES.get(node.kind)
+        if style is None:
+            # Generic SyntaxTreeNode: only the label says what the node is.
+            label = str(node.label)
+            style = self.label_styles.get(label)
+            if style is None:
+                style = self.label_styles[label] = self._label_style(label)
+        return style
+
+    def write_dot(self, root, file):
+        """Write the tree as DOT text to file (anything with a write() method).
+
+        Walks the tree with an explicit stack and writes in batches of
+        WRITE_BATCH lines, so time is linear and memory stays bounded however
+        large or deep the tree is. Shape and colour are emitted as a shared
+        node default whenever they change, not repeated on every node.
+        """
+        file.write(f"// {self.comment}\ndigraph {{\n\trankdir={self.rankdir}\n\tnode [style=filled]\n")
+        lines = []
+        current_style = None
+        node_id = 0
+        stack = [(root, -1)]
+        while stack:
+            node, parent_id = stack.pop()
+            style = self._node_style(node)
+            if style != current_style:
+                lines.append('\tnode [shape=%s fillcolor=%s]\n' % style)
+                current_style = style
+            label = str(node.label).replace("\\", "\\\\").replace('"', '\\"')
+            if node.kind == 'summary':
+                # The URL puts the node in -Tcmapx output, which is how clicks find it.
+                lines.append(f'\tnode{node_id} [label="{label}" URL="summary{node.index}"]\n')
+            else:
+                lines.append(f'\tnode{node_id} [label="{label}"]\n')
+            if parent_id >= 0:
+                lines.append(f"\tnode{parent_id} -> node{node_id}\n")
+            stack.extend((child, node_id) for child in reversed(node.children))
+            node_id += 1
+            if len(lines) >= WRITE_BATCH:
+                file.write("".join(lines))
+                lines.clear()
+        lines.append("}\n")
+        file.write("".join(lines))
+
+    def render_tree(self, root: Node):
+        if not isinstance(root, Node):
             print("Error: Root node is not a valid SyntaxTreeNode.")
             return None
         try:
-            self.node_counter = 0 
-            dot = Digraph(comment=self.comment)
-            dot.attr(rankdir=self.rankdir)
-            
-            self._add_nodes_edges(dot, root)
-            return dot
+            if self.backend == "tidy":
+                return layout_tree(root, self._node_style, self.rankdir)
+            buffer = io.StringIO()
+            self.write_dot(root, buffer)
+            return _source(buffer.getvalue())
 
         except Exception as e:
             print(f"Error creating syntax tree: {str(e)}")
             return None
+
+def render_png(source):
+    """Lay out and rasterise DOT source with Graphviz; safe to run in a worker process."""
+    return _source(source).pipe(format='png')
+
+def render_cmapx(source):
+    """Lay out DOT source and return its client-side image map (-Tcmapx); safe to run in a worker process."""
+    return _source(source).pipe(format='cmapx')
+
+def image_map(cmapx):
+    """Yield (href, (left, top, right, bottom)) for each area in Graphviz -Tcmapx output.
+
+    Coordinates are pixels of the PNG rendering of the same graph.
+    """
+    for area in re.finditer(r'<area\b[^>]*>', cmapx):
+        tag = area.group()
+        href = re.search(r'href="([^"]*)"', tag)
+        coords = re.search(r'coords="([^"]*)"', tag)
+        if not href or not coords:
+            continue
+        values = [int(float(value)) for value in coords.group(1).split(",")]
+        xs, ys = values[0::2], values[1::2]
+        yield href.group(1), (min(xs), min(ys), max(xs), max(ys))
+
+def render_formats(source, formats):
+    """Lay DOT source out once and render it in each of formats; returns {format: bytes}.
+
+    dot -Tdot does the layout and writes the positions back into the graph;
+    neato -n2 then only draws those positions, which is cheap.
+    """
+    positioned = _source(source).pipe(format='dot', encoding='utf-8')
+    drawing = _source(positioned, engine='neato')
+    return {format: drawing.pipe(format=format, neato_no_op=2) for format in formats}
+
+class RenderCache:
+    """In-memory LRU of rendered trees, keyed by a hash of the DOT source and the format.
+
+    Holds at most max_bytes of output; the least recently used entries are
+    evicted first. Thread-safe, since the parse worker fills it and the UI
+    thread reads it. Trees from the "tidy" backend (a layout.TreeLayout)
+    have no DOT source and are drawn in-process, so they bypass the cache.
+    """
+
+    def __init__(self, max_bytes=RENDER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(source, format):
+        return hashlib.sha256(source.encode("utf-8")).hexdigest(), format
+
+    def get(self, source, format):
+        """Return the cached output, or None on a miss."""
+        key = self.key(source, format)
+        with self.lock:
+            data = self.entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, source, format, data):
+        if len(data) > self.max_bytes:
+            return
+        key = self.key(source, format)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def render(self, tree, format):
+        """Return tree (a graphviz.Source or layout.TreeLayout) rendered as format."""
+        return self.export(tree, (format,))[format]
+
+    def export(self, tree, formats=EXPORT_FORMATS):
+        """Render tree in several formats, laying it out at most once; returns {format: bytes}."""
+        source = getattr(tree, "source", None)
+        if source is None:
+            return {format: tree.pipe(format=format) for format in formats}
+        results = {format: self.get(source, format) for format in formats}
+        missing = [format for format, data in results.items() if data is None]
+        if len(missing) == 1:
+            results[missing[0]] = _source(source).pipe(format=missing[0])
+        elif missing:
+            results.update(render_formats(source, missing))
+        for format in missing:
+            self.put(source, format, results[format])
+        return results
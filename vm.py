@@ -0,0 +1,249 @@
+from array import array
+from nodes import Node, Operator, Program, StmtSeq, If, Repeat, Assign, Read, Write, BinOp, Const, Id
+
+# Every instruction is two ints in the code array: opcode, argument.
+# The *_CONST and *_VAR forms are superinstructions for a binary operator
+# whose right operand is a constant or variable: they fold the operand load
+# into the operator, which saves one dispatch per operator in typical code.
+OPCODE_NAMES = (
+    'LOAD_CONST', 'LOAD_VAR', 'STORE_VAR',
+    'ADD', 'SUB', 'MUL', 'DIV', 'LESSTHAN', 'EQUAL',
+    'ADD_CONST', 'SUB_CONST', 'MUL_CONST', 'DIV_CONST', 'LESSTHAN_CONST', 'EQUAL_CONST',
+    'ADD_VAR', 'SUB_VAR', 'MUL_VAR', 'DIV_VAR', 'LESSTHAN_VAR', 'EQUAL_VAR',
+    'READ', 'WRITE', 'JUMP', 'JUMP_IF_FALSE', 'HALT',
+)
+(LOAD_CONST, LOAD_VAR, STORE_VAR,
+ ADD, SUB, MUL, DIV, LESSTHAN, EQUAL,
+ ADD_CONST, SUB_CONST, MUL_CONST, DIV_CONST, LESSTHAN_CONST, EQUAL_CONST,
+ ADD_VAR, SUB_VAR, MUL_VAR, DIV_VAR, LESSTHAN_VAR, EQUAL_VAR,
+ READ, WRITE, JUMP, JUMP_IF_FALSE, HALT) = range(len(OPCODE_NAMES))
+CONST_FORM = ADD_CONST - ADD
+VAR_FORM = ADD_VAR - ADD
+LABEL = -1  # compile-time marker only, never emitted
+
+OPERATOR_OPCODES = {
+    Operator.PLUS: ADD, Operator.MINUS: SUB, Operator.MULT: MUL, Operator.DIV: DIV,
+    Operator.LESSTHAN: LESSTHAN, Operator.EQUAL: EQUAL,
+}
+
+def divide(left, right):
+    """TINY integer division: truncates toward zero."""
+    if right == 0:
+        raise RuntimeError("Division by zero")
+    quotient = abs(left) // abs(right)
+    return -quotient if (left < 0) != (right < 0) else quotient
+
+def read_value(inputs):
+    for value in inputs:
+        return int(value)
+    raise RuntimeError("read: no more input")
+
+class Bytecode:
+    """A compiled TINY program: instruction array, constant pool and variable slots."""
+
+    def __init__(self, code, constants, names):
+        self.code = code
+        self.constants = constants
+        self.names = names
+
+    def disassemble(self):
+        lines = []
+        for pc in range(0, len(self.code), 2):
+            opcode, arg = self.code[pc], self.code[pc + 1]
+            if opcode == LOAD_CONST or ADD_CONST <= opcode <= EQUAL_CONST:
+                operand = f"{arg} ({self.constants[arg]})"
+            elif opcode in (LOAD_VAR, STORE_VAR, READ) or ADD_VAR <= opcode <= EQUAL_VAR:
+                operand = f"{arg} ({self.names[arg]})"
+            elif opcode in (JUMP, JUMP_IF_FALSE):
+                operand = str(arg)
+            else:
+                operand = ""
+            lines.append(f"{pc:6d} {OPCODE_NAMES[opcode]:<14}{operand}".rstrip())
+        return "\n".join(lines)
+
+def compile_program(root):
+    """Compile a parse_program tree into Bytecode, without recursion."""
+    constants, constant_slots = [], {}
+    names, name_slots = [], {}
+    labels = []
+    emitted = []
+    jump_targets = set()
+
+    def constant(value):
+        if value not in constant_slots:
+            constant_slots[value] = len(constants)
+            constants.append(value)
+        return constant_slots[value]
+
+    def slot(name):
+        if name not in name_slots:
+            name_slots[name] = len(names)
+            names.append(name)
+        return name_slots[name]
+
+    def new_label():
+        labels.append(None)
+        return len(labels) - 1
+
+    # Work items are nodes still to compile or (opcode, arg) instructions;
+    # they are pushed in reverse so they pop off in program order.
+    work = [root]
+    while work:
+        item = work.pop()
+        if not isinstance(item, Node):
+            opcode, arg = item
+            if opcode == LABEL:
+                labels[arg] = len(emitted)
+                jump_targets.add(len(emitted))
+            elif ADD <= opcode <= EQUAL and emitted and len(emitted) - 1 not in jump_targets \
+                    and emitted[-1][0] in (LOAD_CONST, LOAD_VAR):
+                operand_opcode, operand = emitted.pop()
+                emitted.append((opcode + (CONST_FORM if operand_opcode == LOAD_CONST else VAR_FORM), operand))
+            else:
+                emitted.append(item)
+            continue
+        if isinstance(item, Program):
+            items = [item.body]
+        elif isinstance(item, StmtSeq):
+            items = item.statements
+        elif isinstance(item, Assign):
+            items = [item.expr, (STORE_VAR, slot(item.name))]
+        elif isinstance(item, Read):
+            items = [(READ, slot(item.name))]
+        elif isinstance(item, Write):
+            items = [item.expr, (WRITE, 0)]
+        elif isinstance(item, If):
+            else_label, end_label = new_label(), new_label()
+            items = [item.cond, (JUMP_IF_FALSE, else_label), item.then_branch]
+            if item.else_branch is not None:
+                items += [(JUMP, end_label), (LABEL, else_label), item.else_branch]
+            else:
+                items.append((LABEL, else_label))
+            items.append((LABEL, end_label))
+        elif isinstance(item, Repeat):
+            top_label = new_label()
+            items = [(LABEL, top_label), item.body, item.cond, (JUMP_IF_FALSE, top_label)]
+        elif isinstance(item, BinOp):
+            items = [item.left, item.right, (OPERATOR_OPCODES[item.op], 0)]
+        elif isinstance(item, Const):
+            items = [(LOAD_CONST, constant(item.value))]
+        elif isinstance(item, Id):
+            items = [(LOAD_VAR, slot(item.name))]
+        else:
+            raise TypeError(f"Cannot compile node {item!r}")
+        work.extend(reversed(items))
+    emitted.append((HALT, 0))
+
+    code = array('i')
+    for opcode, arg in emitted:
+        if opcode in (JUMP, JUMP_IF_FALSE):
+            arg = labels[arg] * 2
+        code.append(opcode)
+        code.append(arg)
+    return Bytecode(code, constants, names)
+
+def execute(bytecode, inputs=(), output=print):
+    """Run Bytecode; read pulls from inputs, write passes each value to output.
+
+    Returns the final variable values as a {name: value} dict.
+    """
+    code = bytecode.code.tolist()
+    constants = bytecode.constants
+    variables = [0] * len(bytecode.names)
+    inputs = iter(inputs)
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+    while True:
+        opcode = code[pc]
+        arg = code[pc + 1]
+        pc += 2
+        if opcode == LOAD_VAR:
+            push(variables[arg])
+        elif opcode == LOAD_CONST:
+            push(constants[arg])
+        elif opcode == STORE_VAR:
+            variables[arg] = pop()
+        elif opcode == JUMP_IF_FALSE:
+            if not pop():
+                pc = arg
+        elif opcode <= EQUAL_VAR:
+            if opcode >= ADD_VAR:
+                opcode -= VAR_FORM
+                right = variables[arg]
+            elif opcode >= ADD_CONST:
+                opcode -= CONST_FORM
+                right = constants[arg]
+            else:
+                right = pop()
+            if opcode == ADD:
+                stack[-1] += right
+            elif opcode == SUB:
+                stack[-1] -= right
+            elif opcode == MUL:
+                stack[-1] *= right
+            elif opcode == LESSTHAN:
+                stack[-1] = 1 if stack[-1] < right else 0
+            elif opcode == EQUAL:
+                stack[-1] = 1 if stack[-1] == right else 0
+            else:
+                stack[-1] = divide(stack[-1], right)
+        elif opcode == JUMP:
+            pc = arg
+        elif opcode == READ:
+            variables[arg] = read_value(inputs)
+        elif opcode == WRITE:
+            output(pop())
+        else:
+            break
+    return dict(zip(bytecode.names, variables))
+
+def interpret(root, inputs=(), output=print):
+    """Reference tree-walking interpreter, for differential testing of execute."""
+    variables = {}
+    inputs = iter(inputs)
+
+    def evaluate(node):
+        if isinstance(node, Const):
+            return node.value
+        if isinstance(node, Id):
+            return variables.get(node.name, 0)
+        left, right = evaluate(node.left), evaluate(node.right)
+        op = node.op
+        if op is Operator.PLUS:
+            return left + right
+        if op is Operator.MINUS:
+            return left - right
+        if op is Operator.MULT:
+            return left * right
+        if op is Operator.DIV:
+            return divide(left, right)
+        if op is Operator.LESSTHAN:
+            return 1 if left < right else 0
+        return 1 if left == right else 0
+
+    def run(node):
+        if isinstance(node, Program):
+            run(node.body)
+        elif isinstance(node, StmtSeq):
+            for statement in node.statements:
+                run(statement)
+        elif isinstance(node, Assign):
+            variables[node.name] = evaluate(node.expr)
+        elif isinstance(node, Read):
+            variables[node.name] = read_value(inputs)
+        elif isinstance(node, Write):
+            output(evaluate(node.expr))
+        elif isinstance(node, If):
+            if evaluate(node.cond):
+                run(node.then_branch)
+            elif node.else_branch is not None:
+                run(node.else_branch)
+        elif isinstance(node, Repeat):
+            run(node.body)
+            while not evaluate(node.cond):
+                run(node.body)
+
+    run(root)
+    return variables